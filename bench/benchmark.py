@@ -0,0 +1,136 @@
+"""Замер пропускной способности очистки на локальном сервере bench/fake_vk_server.py.
+
+Для синтетических групп заданных размеров удаляет все посты, подписчиков или медиафайлы и печатает
+операции в секунду, p50/p99 задержки вызова API и общее время.
+
+Запуск из корня репозитория:
+    python -m bench.benchmark --sizes 1000 10000 100000 --latency 0.01
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from bench.fake_vk_server import FakeVK, parse_errors, start_server
+
+GROUP_ID = 1
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+def timed_client(client):
+    """Оборачивает client.call, собирая длительность каждого HTTP-запроса"""
+    latencies = []
+    call = client.call
+
+    def timed_call(method, params=None, interrupt=None):
+        start = time.perf_counter()
+        try:
+            return call(method, params, interrupt)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    client.call = timed_call
+    return latencies
+
+def run_stage(vk_cleaner, client, stage, journal, interrupt):
+    if stage == 'media':
+        from media_cleaner import clean_media
+        return clean_media(client, -GROUP_ID, interrupt, journal)
+    limits = vk_cleaner.load_limits(-GROUP_ID)
+    if stage == 'posts':
+        return vk_cleaner.delete_posts(client, -GROUP_ID, limits, interrupt, journal)
+    return vk_cleaner.remove_users(client, -GROUP_ID, limits, interrupt, journal)
+
+def run_case(size, stage, args):
+    # Импорт после chdir: config.py создаёт config.json в текущем каталоге
+    import config
+    import vk_cleaner
+    from rate_limiter import RateLimiter
+    from vk_client import VKClient
+    from work_journal import WorkJournal
+
+    config.config.override({
+        "MAX_POSTS_PER_HOUR": 10 ** 9,
+        "MAX_USERS_PER_DAY": 10 ** 9,
+        "API_RPS": args.client_rps,
+        "USE_EXECUTE": not args.no_execute,
+        "SNAPSHOT_MODE": not args.no_snapshot,
+        "MEDIA_RPS": {kind: args.client_rps for kind in ("album", "photo", "video", "doc")},
+    })
+    workdir = tempfile.mkdtemp(prefix='vk_bench_')
+    vk_cleaner.LOG_FILE = os.path.join(workdir, 'vk_limits.log')
+    vk_cleaner.LIMITS_DB = os.path.join(workdir, 'vk_limits.db')
+    vk_cleaner.SKIP_DB = os.path.join(workdir, 'vk_skip.db')
+
+    fake = FakeVK(args.latency, parse_errors(args.errors), args.server_rps or None)
+    media = {'photos': size // 2, 'videos': size // 4, 'docs': size - size // 2 - size // 4} if stage == 'media' else {}
+    fake.add_group(GROUP_ID, posts=size if stage == 'posts' else 0, members=size if stage == 'members' else 0, **media)
+    server, api_url = start_server(fake)
+    client = VKClient('bench-token', config.config["VERSION"], api_url=api_url,
+                      limiter=RateLimiter.from_config(config.config))
+    latencies = timed_client(client)
+    journal = WorkJournal(os.path.join(workdir, 'vk_journal.db')) if config.config["SNAPSHOT_MODE"] else None
+
+    # Подписчиков на события нет, поэтому сообщения о каждом элементе не печатаются и не форматируются
+    start = time.perf_counter()
+    try:
+        done = run_stage(vk_cleaner, client, stage, journal, vk_cleaner.GracefulInterrupt())
+    finally:
+        elapsed = time.perf_counter() - start
+        if journal is not None:
+            journal.close()
+        client.close()
+        server.shutdown()
+    if size and not done:
+        raise RuntimeError(f"{stage} {size}: ничего не удалено за {len(latencies)} запросов")
+
+    return {
+        'size': size,
+        'stage': stage,
+        'done': done,
+        'requests': len(latencies),
+        'ops_per_sec': done / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'wall_sec': elapsed,
+    }
+
+def format_row(result):
+    return (f"{result['stage']:<8} {result['size']:>7} {result['done']:>7} {result['requests']:>8} "
+            f"{result['ops_per_sec']:>9.1f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['wall_sec']:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер скорости очистки на локальном сервере VK API")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--stages', nargs='+', choices=['posts', 'members', 'media'], default=['posts', 'members'])
+    parser.add_argument('--latency', type=float, default=0.0, help="Задержка ответа сервера, сек")
+    parser.add_argument('--errors', default='', help="Вероятности ошибок сервера, например 9:0.01,6:0.02")
+    parser.add_argument('--server-rps', type=int, default=0, help="Лимит сервера, запросов/сек (0 - без лимита)")
+    parser.add_argument('--client-rps', type=float, default=10000, help="API_RPS клиента")
+    parser.add_argument('--no-execute', action='store_true', help="Удалять по одному, без execute")
+    parser.add_argument('--no-snapshot', action='store_true', help="Без журнала работ")
+    parser.add_argument('--output', help="Дополнительно записать отчёт в файл")
+    args = parser.parse_args()
+
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repo_dir)
+    os.chdir(tempfile.mkdtemp(prefix='vk_bench_config_'))
+
+    lines = [f"{'stage':<8} {'size':>7} {'done':>7} {'requests':>8} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'wall s':>9}"]
+    print(lines[0])
+    for size in args.sizes:
+        for stage in args.stages:
+            lines.append(format_row(run_case(size, stage, args)))
+            print(lines[-1])
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+if __name__ == "__main__":
+    main()
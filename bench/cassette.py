@@ -0,0 +1,316 @@
+"""Запись и воспроизведение обмена с VK API для повторяемых проверок скорости и лимитов.
+
+record записывает все запросы очистки и ответы VK в файл-кассету (JSON). Токены в файл не попадают:
+access_token добавляется к параметрам уже при отправке, а вхождения токена в ответах заменяются на <redacted>.
+replay выполняет ту же очистку без сети, отдавая ответы из кассеты с исходной задержкой ответа,
+сжатой (--latency 0.1) или без неё (--latency 0), и завершается с кодом 1, если запросы разошлись
+с записью (лишние запросы или невостребованные ответы). С --speed часы идут быстрее: time.time, time.monotonic,
+time.sleep и паузы остановки ускоряются, поэтому сутки с дневным лимитом подписчиков проходят за секунды.
+Запись с --speed возможна против bench/fake_vk_server.py (VK_API_URL), тогда и сама кассета содержит сутки работы.
+
+Записанные кассеты проверяет на регрессию bench/regression.py.
+
+Оба режима работают во временном каталоге (config.json, журнал, лимиты, список пропуска создаются заново),
+поэтому запись и воспроизведение начинаются с одного состояния.
+
+Запуск из корня репозитория:
+    python -m bench.cassette record run.json -- --group 152273091 --token ваш_токен
+    python -m bench.cassette replay run.json --latency 0.1 -- --group 152273091 --token любой
+    VK_API_URL=http://127.0.0.1:8080/method/ python -m bench.cassette record day.json --speed 3600 \
+        --start '2026-01-01 23:00' -- --group 1 --token test --daemon
+    python -m bench.cassette replay day.json --speed 3600 --start '2026-01-01 23:00' -- --group 1 --token test --daemon
+"""
+import argparse
+import contextlib
+import copy
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+REDACTED = '<redacted>'
+
+# Настоящие часы: ускоренные часы подменяют функции модуля time
+_time, _monotonic, _perf_counter, _sleep = time.time, time.monotonic, time.perf_counter, time.sleep
+
+class CassetteMiss(ConnectionError):
+    """Запроса нет в кассете: поведение разошлось с записью. Клиент видит его как сетевую ошибку"""
+
+def request_key(method, params):
+    return json.dumps([method, params or {}], sort_keys=True, ensure_ascii=False)
+
+def redact(value, secrets):
+    """Копия value, в строках которой секреты заменены на <redacted>"""
+    if isinstance(value, str):
+        for secret in secrets:
+            value = value.replace(secret, REDACTED)
+        return value
+    if isinstance(value, dict):
+        return {key: redact(item, secrets) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item, secrets) for item in value]
+    return value
+
+class Cassette:
+    """Список обменов с API: method, params, response (или error - текст сетевой ошибки),
+    at - секунда от начала записи, duration - время ответа"""
+
+    def __init__(self, interactions=None):
+        self.interactions = interactions or []
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['interactions'])
+
+    def save(self, path):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'interactions': self.interactions}, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, path)
+
+    def add(self, interaction):
+        with self.lock:
+            self.interactions.append(interaction)
+
+@contextlib.contextmanager
+def record(cassette, secrets=()):
+    """Записывает в cassette все запросы всех VKClient внутри блока. Токен каждого клиента
+    и secrets вырезаются из параметров и ответов"""
+    from vk_client import VKClient
+    original = VKClient._post
+    started = _monotonic()
+
+    def post(client, method, params):
+        hidden = [secret for secret in (client.token, *secrets) if secret]
+        interaction = {'method': method, 'params': redact(params or {}, hidden), 'at': round(_monotonic() - started, 3)}
+        start = _perf_counter()
+        try:
+            response = original(client, method, params)
+            interaction['response'] = redact(response, hidden)
+            return response
+        except Exception as e:
+            interaction['error'] = redact(str(e), hidden)
+            raise
+        finally:
+            interaction['duration'] = round(_perf_counter() - start, 4)
+            cassette.add(interaction)
+
+    VKClient._post = post
+    try:
+        yield cassette
+    finally:
+        VKClient._post = original
+
+class Replayer:
+    """Отдаёт ответы из кассеты вместо VK. Одинаковые запросы получают записанные ответы по порядку:
+    например, wall.get с offset=0 до и после удаления постов. latency - доля записанной задержки ответа"""
+
+    def __init__(self, cassette, latency=1.0, on_miss=None):
+        self.latency = latency
+        self.on_miss = on_miss  # Вызывается при первом запросе, которого нет в кассете
+        self.queues = {}
+        for interaction in cassette.interactions:
+            self.queues.setdefault(request_key(interaction['method'], interaction['params']), []).append(interaction)
+        self.lock = threading.Lock()
+        self.served = 0
+        self.misses = []  # (method, params) запросов, которых нет в кассете
+
+    def post(self, client, method, params):
+        key = request_key(method, params)
+        with self.lock:
+            queue = self.queues.get(key)
+            interaction = queue.pop(0) if queue else None
+            if interaction is None:
+                self.misses.append((method, params))
+            else:
+                self.served += 1
+        if interaction is None:
+            if self.on_miss is not None and len(self.misses) == 1:
+                self.on_miss()
+            raise CassetteMiss(f"{method}: запроса нет в кассете")
+        if self.latency and interaction.get('duration'):
+            time.sleep(interaction['duration'] * self.latency)  # С ускоренными часами - ускоренная пауза
+        if 'error' in interaction:
+            raise ConnectionError(interaction['error'])
+        return copy.deepcopy(interaction['response'])
+
+    @property
+    def unused(self):
+        return sum(map(len, self.queues.values()))
+
+    def check(self):
+        """Воспроизведение совпало с записью: каждый запрос нашёлся и каждый ответ использован"""
+        if self.misses or self.unused:
+            raise CassetteMiss(f"Расхождение с кассетой: лишних запросов {len(self.misses)}, "
+                               f"невостребованных ответов {self.unused}")
+
+@contextlib.contextmanager
+def replay(cassette, latency=1.0, on_miss=None):
+    """Внутри блока все VKClient получают ответы из кассеты, сеть не используется"""
+    from vk_client import VKClient
+    replayer = Replayer(cassette, latency, on_miss)
+    original = VKClient._post
+    VKClient._post = lambda client, method, params: replayer.post(client, method, params)
+    try:
+        yield replayer
+    finally:
+        VKClient._post = original
+
+class FakeClock:
+    """Ускоренные часы: виртуальное время идёт в speed раз быстрее настоящего, начиная со start.
+
+    Подменяет time.time, time.monotonic, time.perf_counter и time.sleep, а также wait у классов
+    остановки (GracefulInterrupt): на них построены паузы ограничителя скорости, повторов и ожидание
+    сброса лимита. Часы не перепрыгивают паузы, а сжимают их, поэтому потоки, фоновые проверки
+    конфигурации и ограничитель скорости видят одну согласованную шкалу времени.
+    """
+
+    def __init__(self, speed=3600, start=None):
+        self.speed = speed
+        self.start = _time() if start is None else start
+        self.real_start = _monotonic()
+        self.patched = []
+
+    def elapsed(self):
+        return (_monotonic() - self.real_start) * self.speed
+
+    def time(self):
+        return self.start + self.elapsed()
+
+    def monotonic(self):
+        return self.real_start + self.elapsed()
+
+    def sleep(self, seconds):
+        _sleep(max(0, seconds) / self.speed)
+
+    def scale(self, timeout):
+        return None if timeout is None else max(0, timeout) / self.speed
+
+    def patch(self, owner, name, value):
+        self.patched.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, value)
+
+    def install(self, *interrupt_classes):
+        self.patch(time, 'time', self.time)
+        self.patch(time, 'monotonic', self.monotonic)
+        self.patch(time, 'perf_counter', self.monotonic)
+        self.patch(time, 'sleep', self.sleep)
+        for cls in interrupt_classes:
+            wait = cls.wait
+            self.patch(cls, 'wait', lambda interrupt, timeout=None, wait=wait: wait(interrupt, self.scale(timeout)))
+        return self
+
+    def uninstall(self):
+        while self.patched:
+            owner, name, value = self.patched.pop()
+            setattr(owner, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+def prepare_workdir(vk_cleaner):
+    """Временный каталог для журнала, лимитов и списка пропуска: запуск начинается с чистого состояния"""
+    workdir = tempfile.mkdtemp(prefix='vk_cassette_')
+    vk_cleaner.LOG_FILE = os.path.join(workdir, 'vk_limits.log')
+    vk_cleaner.LIMITS_DB = os.path.join(workdir, 'vk_limits.db')
+    vk_cleaner.JOURNAL_FILE = os.path.join(workdir, 'vk_journal.db')
+    vk_cleaner.SKIP_DB = os.path.join(workdir, 'vk_skip.db')
+    return workdir
+
+def parse_start(value):
+    from datetime import datetime
+    return datetime.strptime(value, '%Y-%m-%d %H:%M').timestamp()
+
+def load_cleaner():
+    """vk_cleaner из корня репозитория. Импорт из временного каталога: config.py создаёт config.json в текущем каталоге"""
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if repo_dir not in sys.path:
+        sys.path.insert(0, repo_dir)
+    os.chdir(tempfile.mkdtemp(prefix='vk_cassette_config_'))
+    import vk_cleaner
+    return vk_cleaner
+
+def run(mode, cassette_path, cleaner_args, latency=1.0, speed=1.0, start=None, settings=None, on_event=None):
+    """Один запуск vk_cleaner.cli(cleaner_args) с записью ('record') или воспроизведением ('replay') кассеты.
+    settings - значения поверх config.json, on_event - подписчик шины событий на время запуска.
+    Возвращает (код выхода, Cassette при записи или Replayer при воспроизведении, секунд по часам очистки)"""
+    vk_cleaner = load_cleaner()
+    prepare_workdir(vk_cleaner)
+    if settings:
+        vk_cleaner.config.config.override(settings)
+    if on_event is not None:
+        vk_cleaner.events.subscribe(on_event)
+
+    started = _monotonic()
+    clock = None
+    if speed != 1 or start is not None:
+        clock = FakeClock(speed, start).install(vk_cleaner.GracefulInterrupt)
+        # Время работы в итогах - по ускоренным часам, а не от импорта модулей
+        vk_cleaner.metrics.started = time.time()
+        # config.json проверяется по настоящим часам: при ускорении раз в 2 сек превратилось бы в раз в миллисекунду
+        watch = vk_cleaner.config.config.watch
+        clock.patch(vk_cleaner.config.config, 'watch', lambda interval=2: watch(interval * speed))
+    try:
+        if mode == 'record':
+            result = Cassette()
+            try:
+                with record(result):
+                    code = vk_cleaner.cli(cleaner_args)
+            finally:
+                result.save(cassette_path)
+        else:
+            # Расхождение с записью останавливает очистку так же, как Ctrl+C: служба иначе ждала бы
+            # новых окон лимита, повторяя запросы, которых в кассете нет
+            with replay(Cassette.load(cassette_path), latency,
+                        on_miss=lambda: signal.raise_signal(signal.SIGINT)) as result:
+                code = vk_cleaner.cli(cleaner_args)
+    finally:
+        virtual = clock.elapsed() if clock else _monotonic() - started
+        if clock:
+            clock.uninstall()
+        if on_event is not None:
+            vk_cleaner.events.unsubscribe(on_event)
+    return code, result, virtual
+
+def main():
+    parser = argparse.ArgumentParser(description="Запись и воспроизведение запросов очистки к VK API")
+    parser.add_argument('mode', choices=['record', 'replay'])
+    parser.add_argument('cassette', help="Файл кассеты (JSON)")
+    parser.add_argument('--latency', type=float, default=1.0,
+                        help="Доля записанной задержки ответа при воспроизведении (0 - без задержки)")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Во сколько раз ускорить часы (для записи - только с локальным сервером)")
+    parser.add_argument('--start', type=parse_start, help="Виртуальное время начала, 'ГГГГ-ММ-ДД ЧЧ:ММ'")
+    # Всё после -- передаётся vk_cleaner как есть
+    argv = sys.argv[1:]
+    split = argv.index('--') if '--' in argv else len(argv)
+    args = parser.parse_args(argv[:split])
+
+    started = _monotonic()
+    code, result, virtual = run(args.mode, os.path.abspath(args.cassette), argv[split + 1:],
+                                args.latency, args.speed, args.start)
+    if args.mode == 'record':
+        print(f"Записано запросов: {len(result.interactions)}")
+    else:
+        print(f"Воспроизведено запросов: {result.served}, нет в кассете: {len(result.misses)}, "
+              f"не использовано: {result.unused}")
+    print(f"Время: {_monotonic() - started:.1f} сек, по часам очистки: {virtual:.0f} сек")
+    if args.mode == 'replay':
+        # Проверка на регрессию: запросы должны совпасть с записью один к одному
+        try:
+            result.check()
+        except CassetteMiss as e:
+            print(f"❌ {e}")
+            return code or 1
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""Локальная замена api.vk.com для замеров и проверки без обращения к настоящему VK.
+
+Поддерживает wall.get, wall.delete, groups.getMembers, groups.removeUser, execute, users.get
+и методы медиафайлов (photos.getAlbums/getAll/delete/deleteAlbum, video.get/delete, docs.get/delete),
+задержку ответа, случайные ошибки (4, 6, 9, 15, 29) и собственный лимит запросов в секунду.
+
+Запуск:
+    python -m bench.fake_vk_server --port 8080 --posts 1000 --members 1000 --latency 0.05 --errors 9:0.01,6:0.02
+    VK_API_URL=http://127.0.0.1:8080/method/ python gui.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ERROR_MESSAGES = {
+    4: "Incorrect signature",
+    5: "User authorization failed: invalid access_token (4).",
+    6: "Too many requests per second",
+    9: "Flood control",
+    15: "Access denied: can't remove this user",
+    29: "Rate limit reached",
+    100: "One of the parameters specified was missing or invalid",
+}
+REQUEST_ERRORS = (4, 6)  # Ошибки уровня запроса целиком
+METHOD_ERRORS = (9, 15, 29)  # Ошибки отдельного метода, внутри execute попадают в execute_errors
+DELETE_METHODS = ('wall.delete', 'groups.removeUser', 'photos.delete', 'photos.deleteAlbum', 'video.delete', 'docs.delete')
+# Методы медиафайлов: список -> (вид, предельный count), удаление -> (вид, имя параметра с ID)
+MEDIA_LIST_METHODS = {'photos.getAlbums': ('album', 100), 'photos.getAll': ('photo', 200),
+                      'video.get': ('video', 200), 'docs.get': ('doc', 2000)}
+MEDIA_DELETE_METHODS = {'photos.deleteAlbum': ('album', 'album_id'), 'photos.delete': ('photo', 'photo_id'),
+                        'video.delete': ('video', 'video_id'), 'docs.delete': ('doc', 'doc_id')}
+EXECUTE_CALL = re.compile(r'API\.([\w.]+)\((\{.*?\})\)')
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(ERROR_MESSAGES.get(code, "Unknown error"))
+        self.code = code
+
+    def as_dict(self, method=None):
+        error = {'error_code': self.code, 'error_msg': str(self)}
+        if method:
+            error['method'] = method
+        return error
+
+class FakeGroup:
+    def __init__(self, group_id, posts=0, members=0, managers=1, start_date=1500000000,
+                 albums=0, photos=0, videos=0, docs=0, pinned=None, dead=0, inactive=0):
+        self.group_id = abs(group_id)
+        # Посты отсортированы от новых к старым, как отдаёт wall.get
+        self._posts = [{'id': post_id, 'date': start_date + post_id * 3600} for post_id in range(posts, 0, -1)]
+        if pinned:  # Закреплённый пост отдаётся первым, вне порядка дат
+            post = next(post for post in self._posts if post['id'] == pinned)
+            self._posts.remove(post)
+            self._posts.insert(0, dict(post, is_pinned=1))
+        self._members = list(range(1, members + 1))
+        self.post_ids = set(range(1, posts + 1))
+        self.member_ids = set(self._members)
+        self.managers = {user_id: 'creator' if user_id == 1 else 'administrator'
+                         for user_id in self._members[:managers]}
+        # Последние dead участников - удалённые страницы, перед ними inactive давно не заходивших
+        self.dead = set(self._members[members - dead:]) if dead else set()
+        self.inactive = set(self._members[max(0, members - dead - inactive):members - dead]) if inactive else set()
+        self.start_date = start_date
+        # Медиафайлы: вид -> {ID: альбом}. Фото раскладываются по альбомам и системному альбому (0),
+        # удаление альбома удаляет его фото
+        self.media = {
+            'album': dict.fromkeys(range(1, albums + 1)),
+            'photo': {photo_id: photo_id % (albums + 1) for photo_id in range(1, photos + 1)},
+            'video': dict.fromkeys(range(1, videos + 1)),
+            'doc': dict.fromkeys(range(1, docs + 1)),
+        }
+
+    # Удаление только убирает ID из множества, списки сжимаются лениво при следующем чтении,
+    # иначе удаление из середины списка на 100k элементов делает замеры квадратичными
+    @property
+    def posts(self):
+        if len(self._posts) != len(self.post_ids):
+            self._posts = [post for post in self._posts if post['id'] in self.post_ids]
+        return self._posts
+
+    @property
+    def members(self):
+        if len(self._members) != len(self.member_ids):
+            self._members = [user_id for user_id in self._members if user_id in self.member_ids]
+        return self._members
+
+class FakeVK:
+    def __init__(self, latency=0.0, errors=None, rps=None, quotas=None, seed=0):
+        self.latency = latency
+        self.errors = errors or {}  # Код ошибки -> вероятность
+        self.rps = rps  # Лимит запросов в секунду на токен, при превышении - ошибка 6
+        self.quotas = quotas or {}  # Метод -> сколько вызовов разрешено, затем ошибка 29
+        self.random = random.Random(seed)
+        self.groups = {}
+        self.revoked = set()
+        self.requests = 0
+        self.method_calls = {}
+        self.recent = {}
+        self.lock = threading.Lock()
+
+    def add_group(self, group_id, posts=0, members=0, managers=1, **media):
+        group = FakeGroup(group_id, posts, members, managers, **media)
+        self.groups[group.group_id] = group
+        return group
+
+    def group(self, params, key):
+        group = self.groups.get(abs(int(params.get(key, 0))))
+        if group is None:
+            raise ApiError(100)
+        return group
+
+    def inject(self, codes, method=None):
+        for code in codes:
+            if code == 15 and method not in DELETE_METHODS:
+                continue
+            if self.random.random() < self.errors.get(code, 0):
+                raise ApiError(code)
+
+    def handle(self, method, params):
+        """Обрабатывает один HTTP-запрос и возвращает JSON-ответ в формате VK"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self.lock:
+            self.requests += 1
+            token = params.get('access_token', '')
+            try:
+                if not token or token in self.revoked:
+                    raise ApiError(5)
+                self.check_rate(token)
+                self.inject(REQUEST_ERRORS)
+
+                if method == 'execute':
+                    return self.execute(params.get('code', ''))
+                return {'response': self.call(method, params)}
+            except ApiError as e:
+                return {'error': e.as_dict()}
+
+    def check_rate(self, token):
+        if not self.rps:
+            return
+        now = time.monotonic()
+        window = self.recent.setdefault(token, deque())
+        while window and now - window[0] > 1:
+            window.popleft()
+        if len(window) >= self.rps:
+            raise ApiError(6)
+        window.append(now)
+
+    def execute(self, code):
+        results = []
+        errors = []
+        for method, args in EXECUTE_CALL.findall(code)[:25]:
+            try:
+                results.append(self.call(method, json.loads(args)))
+            except ApiError as e:
+                results.append(False)
+                errors.append(e.as_dict(method))
+        response = {'response': results}
+        if errors:
+            response['execute_errors'] = errors
+        return response
+
+    def call(self, method, params):
+        self.method_calls[method] = self.method_calls.get(method, 0) + 1
+        if method in self.quotas and self.method_calls[method] > self.quotas[method]:
+            raise ApiError(29)
+        self.inject(METHOD_ERRORS, method)
+
+        if method == 'users.get':
+            return [{'id': 1, 'first_name': 'Test', 'last_name': 'User'}]
+
+        if method == 'wall.get':
+            group = self.group(params, 'owner_id')
+            offset, count = int(params.get('offset', 0)), min(int(params.get('count', 20)), 100)
+            return {'count': len(group.posts), 'items': group.posts[offset:offset + count]}
+
+        if method == 'wall.delete':
+            group = self.group(params, 'owner_id')
+            post_id = int(params['post_id'])
+            if post_id not in group.post_ids:
+                raise ApiError(100)
+            group.post_ids.discard(post_id)
+            return 1
+
+        if method == 'groups.getMembers':
+            group = self.group(params, 'group_id')
+            offset, count = int(params.get('offset', 0)), min(int(params.get('count', 1000)), 1000)
+            items = []
+            fields = params.get('fields', '').split(',')
+            for user_id in group.members[offset:offset + count]:
+                member = {'id': user_id}
+                if user_id in group.managers:
+                    member['role'] = group.managers[user_id]
+                if user_id in group.dead:
+                    member['deactivated'] = 'deleted'
+                elif 'last_seen' in fields:
+                    seen = group.start_date if user_id in group.inactive else int(time.time())
+                    member['last_seen'] = {'time': seen, 'platform': 7}
+                items.append(member)
+            return {'count': len(group.members), 'items': items}
+
+        if method == 'groups.removeUser':
+            group = self.group(params, 'group_id')
+            user_id = int(params['user_id'])
+            if user_id in group.managers:
+                raise ApiError(15)
+            if user_id not in group.member_ids:
+                raise ApiError(100)
+            group.member_ids.discard(user_id)
+            return 1
+
+        if method in MEDIA_LIST_METHODS:
+            kind, limit = MEDIA_LIST_METHODS[method]
+            group = self.group(params, 'owner_id')
+            offset, count = int(params.get('offset', 0)), min(int(params.get('count', limit)), limit)
+            item_ids = list(group.media[kind])
+            return {'count': len(item_ids),
+                    'items': [{'id': item_id, 'owner_id': -group.group_id} for item_id in item_ids[offset:offset + count]]}
+
+        if method in MEDIA_DELETE_METHODS:
+            kind, key = MEDIA_DELETE_METHODS[method]
+            group = self.group(params, 'group_id' if kind == 'album' else 'owner_id')
+            item_id = int(params[key])
+            if item_id not in group.media[kind]:
+                raise ApiError(100)
+            del group.media[kind][item_id]
+            if kind == 'album':
+                for photo_id in [p for p, album_id in group.media['photo'].items() if album_id == item_id]:
+                    del group.media['photo'][photo_id]
+            return 1
+
+        raise ApiError(100)
+
+class FakeVKHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.reply(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.reply(parse_qs(self.rfile.read(length).decode('utf-8')))
+
+    def reply(self, query):
+        method = urlparse(self.path).path.rstrip('/').rsplit('/', 1)[-1]
+        params = {key: values[0] for key, values in query.items()}
+        body = json.dumps(self.server.fake.handle(method, params), ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_server(fake, host='127.0.0.1', port=0):
+    """Запускает сервер в фоновом потоке. Возвращает (server, api_url)"""
+    server = ThreadingHTTPServer((host, port), FakeVKHandler)
+    server.daemon_threads = True
+    server.fake = fake
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/method/"
+
+def parse_errors(value):
+    """'9:0.01,6:0.02' -> {9: 0.01, 6: 0.02}"""
+    errors = {}
+    for part in filter(None, (value or '').split(',')):
+        code, probability = part.split(':')
+        errors[int(code)] = float(probability)
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный сервер-замена VK API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--group-id', type=int, default=1)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--members', type=int, default=1000)
+    parser.add_argument('--managers', type=int, default=1)
+    parser.add_argument('--albums', type=int, default=0)
+    parser.add_argument('--photos', type=int, default=0)
+    parser.add_argument('--videos', type=int, default=0)
+    parser.add_argument('--docs', type=int, default=0)
+    parser.add_argument('--pinned', type=int, help="ID закреплённого поста")
+    parser.add_argument('--dead', type=int, default=0, help="Удалённых страниц среди участников")
+    parser.add_argument('--inactive', type=int, default=0, help="Давно не заходивших участников")
+    parser.add_argument('--latency', type=float, default=0.0, help="Задержка ответа, сек")
+    parser.add_argument('--errors', default='', help="Вероятности ошибок, например 9:0.01,6:0.02")
+    parser.add_argument('--rps', type=int, default=0, help="Лимит запросов в секунду на токен (0 - без лимита)")
+    args = parser.parse_args()
+
+    fake = FakeVK(args.latency, parse_errors(args.errors), args.rps or None)
+    fake.add_group(args.group_id, args.posts, args.members, args.managers,
+                   albums=args.albums, photos=args.photos, videos=args.videos, docs=args.docs,
+                   pinned=args.pinned, dead=args.dead, inactive=args.inactive)
+    server, api_url = start_server(fake, args.host, args.port)
+    print(f"Fake VK API: {api_url} (группа -{args.group_id})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
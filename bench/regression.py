@@ -0,0 +1,85 @@
+"""Проверка на регрессию по кассетам из bench/cassettes: очистка должна выполнить те же запросы к API,
+что и при записи, и удалить ожидаемое число постов и подписчиков. Код выхода 1 - поведение изменилось.
+
+Кассеты записаны против bench/fake_vk_server.py, который запускается в этом же процессе. После намеренного
+изменения запросов очистки кассеты перезаписываются, а разница в них проверяется вместе с изменением:
+    python -m bench.regression --record
+
+Запуск из корня репозитория:
+    python -m bench.regression
+"""
+import argparse
+import os
+import sys
+from collections import Counter
+
+from bench.cassette import CassetteMiss, parse_start, run
+from bench.fake_vk_server import FakeVK, start_server
+
+CASSETTE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cassettes')
+
+# Служба стартует в 23:00: подписчики - 100 до полуночи и остаток после сброса в 00:01,
+# посты - по 50 в час до ~03:00. Первый участник - создатель группы, он остаётся
+CASES = [
+    {
+        'name': 'daemon_day',
+        'group': {'group_id': 1, 'posts': 250, 'members': 151, 'managers': 1},
+        'settings': {"MAX_POSTS_PER_HOUR": 50, "MAX_USERS_PER_DAY": 100},
+        'args': ['--group', '1', '--token', 'regression-token', '--daemon', '-q'],
+        'speed': 3600,
+        'start': '2026-01-01 23:00',
+        'expected': {'post_deleted': 250, 'member_removed': 150},
+    },
+]
+
+def run_case(case, mode):
+    """Запись или воспроизведение одного случая. Возвращает список расхождений (пустой - всё совпало)"""
+    path = os.path.join(CASSETTE_DIR, f"{case['name']}.json")
+    counts = Counter()
+    code, result, virtual = run(mode, path, case['args'], speed=case['speed'], start=parse_start(case['start']),
+                                settings=case['settings'], on_event=lambda event: counts.update([event.kind]))
+
+    problems = []
+    if code:
+        problems.append(f"код выхода {code}")
+    if mode == 'replay':
+        try:
+            result.check()
+        except CassetteMiss as e:
+            problems.append(str(e))
+    for kind, expected in case['expected'].items():
+        if counts[kind] != expected:
+            problems.append(f"{kind}: {counts[kind]} вместо {expected}")
+    print(f"{case['name']}: запросов {len(result.interactions) if mode == 'record' else result.served}, "
+          f"по часам очистки {virtual:.0f} сек - {'; '.join(problems) or 'ок'}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка очистки на регрессию по записанным кассетам")
+    parser.add_argument('--record', action='store_true',
+                        help="Перезаписать кассеты против локального сервера вместо проверки")
+    parser.add_argument('cases', nargs='*', help="Имена случаев (по умолчанию все)")
+    args = parser.parse_args()
+    cases = [case for case in CASES if not args.cases or case['name'] in args.cases]
+
+    if args.record:
+        os.makedirs(CASSETTE_DIR, exist_ok=True)
+        fake = FakeVK()
+        for case in cases:
+            fake.add_group(**case['group'])
+        server, api_url = start_server(fake)
+        # Адрес API читается при импорте vk_client, поэтому задаётся до первого запуска
+        os.environ['VK_API_URL'] = api_url
+    # Настройки случая задаются явно, config.json пользователя не участвует
+    os.environ.pop('VK_CLEANER_CONFIG', None)
+
+    failed = [case['name'] for case in cases if run_case(case, 'record' if args.record else 'replay')]
+    if args.record:
+        server.shutdown()
+    if failed:
+        print(f"❌ Поведение изменилось: {', '.join(failed)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
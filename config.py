@@ -1,76 +1,227 @@
 import os
 import json
+import threading
+import time
 from datetime import datetime
 
-CONFIG_FILE = "config.json"
+CONFIG_FILE = os.environ.get("VK_CLEANER_CONFIG", "config.json")
 
 DEFAULT_CONFIG = {
     "ACCESS_TOKEN": "",
+    "ACCESS_TOKENS": [],             # Токены других администраторов той же группы
     "GROUP_ID": "",
+    "GROUP_IDS": [],                 # Несколько групп для параллельной очистки (вместо GROUP_ID)
+    "GROUP_WORKERS": 4,              # Сколько групп чистить одновременно
     "VERSION": "5.131",
     "MAX_USERS_PER_DAY": 1000,       # Лимит удалений в день
     "MAX_POSTS_PER_HOUR": 100,       # Лимит удалений в час
-    "DELAY": 2,                      # Основная задержка между операциями (сек)
-    "REQUEST_DELAY": 3,              # Задержка между запросами (сек)
-    "FLOOD_DELAY": 10,               # Задержка при флуд-контроле
-    "MEMBERS_PER_REQUEST": 200,      # Участников за один запрос
-    "POSTS_PER_REQUEST": 100,        # Постов за один запрос
-    "API_RETRY_LIMIT": 3,            # Количество попыток при ошибках API
+    "API_RPS": 3,                    # Потолок запросов в секунду на токен (документированный VK)
+    "METHOD_RPS": {},                # Отдельные потолки для методов, например {"wall.delete": 1}
+    "FLOOD_DELAY": 10,               # Базовая пауза при флуд-контроле (сек)
+    "MEMBERS_PER_REQUEST": 1000,     # Участников на странице (макс. 1000)
+    "INACTIVE_DAYS": 0,              # Не заходившие столько дней исключаются раньше остальных (0 - не проверять)
+    "ONLY_INACTIVE": False,          # Исключать только удалённые, заблокированные и неактивные страницы
+    "POSTS_PER_REQUEST": 100,        # Постов на странице (макс. 100)
+    "BULK_PAGES": 25,                # Страниц списка в одном execute при составлении журнала (макс. 25)
+    "POSTS_BEFORE": "",              # Удалять только посты старше даты (ГГГГ-ММ-ДД или ДД.ММ.ГГГГ), пусто - все
+    "POSTS_AFTER": "",               # Удалять только посты не старше даты, пусто - все
+    "SNAPSHOT_MODE": True,           # Сначала составить список ID в журнале, затем удалять по нему
+    "PREFETCH_PAGES": 2,             # Сколько страниц загружать заранее, пока идёт удаление
+    "API_RETRY_LIMIT": 3,            # Повторов после сетевых и внутренних ошибок VK
+    "BREAKER_ERROR_RATE": 0.5,       # Доля ошибок за минуту, при которой все запросы приостанавливаются
+    "BREAKER_COOLDOWN": 30,          # Первая пауза после срабатывания (сек), далее удваивается до 300
+    "SKIP_TTL_DAYS": 7,              # Сколько дней не трогать неудаляемые посты и руководителей (0 - проверять каждый раз)
+    "USE_EXECUTE": True,             # Удалять пачками через execute
+    "BATCH_SIZE": 25,                # Удалений в одном execute (макс. 25)
+    "CLEAN_MEDIA": False,            # Удалять альбомы, фото, видео и документы параллельно с постами
+    "MEDIA_TYPES": ["album", "photo", "video", "doc"],  # Какие медиафайлы удалять
+    "MEDIA_RPS": {},                 # Запросов execute в секунду для каждого вида, например {"photo": 2}
+    "METRICS_FILE": "",              # Файл метрик в формате Prometheus (пусто - не записывать)
+    "METRICS_PORT": 0,               # Порт HTTP для метрик на 127.0.0.1 (0 - выключено)
+    "COMPACT_LOG": True,             # Сворачивать строки об отдельных удалениях в строку прогресса
     "LAST_RATE_LIMIT": None          # Время последнего лимита
 }
 
-def load_config():
-    if not os.path.exists(CONFIG_FILE):
-        save_config(DEFAULT_CONFIG)
+def validate(values):
+    """Приводит значения к типам из DEFAULT_CONFIG и нормализует ID групп.
+    Неверное значение заменяется значением по умолчанию"""
+    result = dict(DEFAULT_CONFIG)
+    result.update(values)
+    for key, default in DEFAULT_CONFIG.items():
+        value = result[key]
+        if default is None:
+            continue
+        try:
+            if isinstance(default, bool):
+                if not isinstance(value, bool):
+                    value = str(value).strip().lower() in ("1", "true", "yes", "да")
+            elif isinstance(default, (int, float)):
+                value = float(value)
+                if value.is_integer():
+                    value = int(value)
+            elif isinstance(default, (list, dict)):
+                if not isinstance(value, type(default)):
+                    raise TypeError(type(value).__name__)
+            else:
+                value = str(value)
+        except (TypeError, ValueError):
+            print(f"Неверное значение {key} в конфиге: {value!r}, используется {default!r}")
+            value = default
+        result[key] = value
+
+    # Валидация GROUP_ID
+    if result["GROUP_ID"]:
+        result["GROUP_ID"] = normalize_group_id(result["GROUP_ID"])
+    result["GROUP_IDS"] = [g for g in map(normalize_group_id, result["GROUP_IDS"]) if g]
+
+    # Сохраняем время последнего лимита как строку
+    if isinstance(result["LAST_RATE_LIMIT"], datetime):
+        result["LAST_RATE_LIMIT"] = result["LAST_RATE_LIMIT"].isoformat()
+    return result
+
+def write_config(values, path=CONFIG_FILE):
+    try:
+        with open(path, "w", encoding='utf-8') as f:
+            json.dump(values, f, indent=2, ensure_ascii=False)
+    except Exception as e:
+        print(f"Ошибка сохранения конфига: {e}")
+
+def load_config(path=CONFIG_FILE):
+    """Читает и проверяет config.json. Используйте config - он читает файл только при изменении"""
+    if not os.path.exists(path):
+        write_config(DEFAULT_CONFIG, path)
         return DEFAULT_CONFIG.copy()
     
     try:
-        with open(CONFIG_FILE, "r", encoding='utf-8') as f:
-            config = json.load(f)
-            
-            # Обновляем конфиг, если добавились новые параметры
-            updated = False
-            for key, value in DEFAULT_CONFIG.items():
-                if key not in config:
-                    config[key] = value
-                    updated = True
+        with open(path, "r", encoding='utf-8') as f:
+            raw = json.load(f)
             
-            if updated:
-                save_config(config)
+        config = validate(raw)
+        # Обновляем конфиг, если добавились новые параметры
+        if any(key not in raw for key in DEFAULT_CONFIG):
+            write_config(config, path)
                 
-            return config
+        return config
             
     except Exception as e:
         print(f"Ошибка загрузки конфига: {e}")
         return DEFAULT_CONFIG.copy()
 
+class Config(dict):
+    """Настройки в памяти. Файл читается один раз и перечитывается, только если изменился на диске.
+
+    Чтение config[...] не обращается к диску. Подписчики получают callback(config, changed_keys)
+    после каждого изменения - из reload(), watch() или save(). Значения из override() (аргументы
+    командной строки) действуют поверх файла и не записываются в него.
+    """
+
+    def __init__(self, path=CONFIG_FILE):
+        super().__init__()
+        self.path = path
+        self.mtime = None
+        self.applied = {}  # Значения, о которых подписчики уже знают
+        self.file_values = {}  # Значения из файла, без override()
+        self.overrides = {}
+        self.subscribers = []
+        self.lock = threading.RLock()
+        self.watcher = None
+        self.reload(force=True)
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _apply(self, file_values):
+        with self.lock:
+            self.file_values = file_values
+            values = {**file_values, **self.overrides}
+            changed = {key for key in values.keys() | self.applied.keys()
+                       if values.get(key) != self.applied.get(key)}
+            self.update(values)
+            self.applied = values
+            subscribers = list(self.subscribers)
+        for callback in subscribers if changed else ():
+            try:
+                callback(self, changed)
+            except Exception as e:
+                print(f"Ошибка применения настроек: {e}")
+        return changed
+
+    def reload(self, force=False):
+        """Перечитывает файл, если он изменился. Возвращает множество изменённых ключей"""
+        with self.lock:
+            mtime = self._file_mtime()
+            if not force and mtime == self.mtime:
+                return set()
+            values = load_config(self.path)
+            self.mtime = self._file_mtime()
+        return self._apply(values)
+
+    def save(self, values=None):
+        """Проверяет и записывает настройки (по умолчанию - текущие) и оповещает подписчиков"""
+        with self.lock:
+            values = validate(dict(self) if values is None else values)
+            # Переопределённые значения в файл не попадают, там остаются прежние
+            values.update({key: self.file_values[key] for key in self.overrides if key in self.file_values})
+            write_config(values, self.path)
+            self.mtime = self._file_mtime()
+        return self._apply(values)
+
+    def override(self, values):
+        """Значения только для этого процесса: переживают перечитывание файла, но не сохраняются"""
+        with self.lock:
+            checked = validate({**self.file_values, **values})
+            self.overrides.update({key: checked[key] for key in values})
+        return self._apply(self.file_values)
+
+    def subscribe(self, callback):
+        with self.lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def watch(self, interval=2):
+        """Фоновая проверка файла: правки config.json применяются без перезапуска"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.reload()
+
+        with self.lock:
+            if self.watcher is None:
+                self.watcher = threading.Thread(target=loop, daemon=True)
+                self.watcher.start()
+
+def normalize_group_id(group_id):
+    group_id = str(group_id).strip()
+    if group_id.replace("-", "").isdigit():
+        return "-" + group_id.lstrip("-")
+    return ""
+
+def get_group_ids(config):
+    """Список групп для очистки: GROUP_IDS, а если он пуст - единственный GROUP_ID"""
+    group_ids = [normalize_group_id(g) for g in config.get("GROUP_IDS") or []]
+    group_ids = [g for g in group_ids if g] or ([config["GROUP_ID"]] if config.get("GROUP_ID") else [])
+    return [int(g) for g in dict.fromkeys(group_ids)]
+
+def get_tokens(config):
+    """Все токены: основной ACCESS_TOKEN и дополнительные ACCESS_TOKENS без повторов"""
+    tokens = [config.get("ACCESS_TOKEN")] + list(config.get("ACCESS_TOKENS") or [])
+    return list(dict.fromkeys(token.strip() for token in tokens if token and token.strip()))
+
 def save_config(new_config):
-    # Валидация GROUP_ID
-    if "GROUP_ID" in new_config and new_config["GROUP_ID"]:
-        group_id = str(new_config["GROUP_ID"])
-        if group_id.replace("-", "").isdigit():
-            if not group_id.startswith("-"):
-                new_config["GROUP_ID"] = "-" + group_id.lstrip("-")
-        else:
-            new_config["GROUP_ID"] = ""
-    
-    # Сохраняем время последнего лимита как строку
-    if "LAST_RATE_LIMIT" in new_config and isinstance(new_config["LAST_RATE_LIMIT"], datetime):
-        new_config["LAST_RATE_LIMIT"] = new_config["LAST_RATE_LIMIT"].isoformat()
-    
-    try:
-        with open(CONFIG_FILE, "w", encoding='utf-8') as f:
-            json.dump(new_config, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        print(f"Ошибка сохранения конфига: {e}")
+    config.save(new_config)
 
 def update_last_rate_limit():
-    config = load_config()
-    config["LAST_RATE_LIMIT"] = datetime.now().isoformat()
-    save_config(config)
+    config.save({**config, "LAST_RATE_LIMIT": datetime.now().isoformat()})
 
 def get_rate_limit_delay():
-    config = load_config()
+    # Только память: файл перечитывается лишь при изменении
     if not config.get("LAST_RATE_LIMIT"):
         return 0
         
@@ -81,4 +232,4 @@ def get_rate_limit_delay():
     except:
         return 0
 
-config = load_config()
\ No newline at end of file
+config = Config()
@@ -0,0 +1,100 @@
+import threading
+import time
+from datetime import datetime
+
+# Виды событий очистки
+MESSAGE = 'message'                # Текстовое сообщение: text
+POST_DELETED = 'post_deleted'      # group_id, post_id, session_total
+MEMBER_REMOVED = 'member_removed'  # group_id, user_id, session_total, daily_limit
+MEDIA_DELETED = 'media_deleted'    # group_id, media (вид файлов), title, count, total
+RATE_LIMITED = 'rate_limited'      # method, code, delay, message (текст ошибки VK, может отсутствовать)
+LIMIT_REACHED = 'limit_reached'    # group_id, limit ('posts' или 'members'), reset_time (datetime)
+ERROR = 'error'                    # code (код VK или None), text; иногда group_id, item_id
+
+class Event:
+    """Событие очистки: вид kind, время и поля, переданные в emit()"""
+
+    def __init__(self, kind, **fields):
+        self.kind = kind
+        self.time = time.time()
+        self.__dict__.update(fields)
+
+    def __repr__(self):
+        fields = ", ".join(f"{key}={value!r}" for key, value in self.__dict__.items() if key not in ('kind', 'time'))
+        return f"Event({self.kind}, {fields})"
+
+class EventBus:
+    """Потокобезопасная шина событий. Подписчики вызываются в потоке, который отправил событие,
+    поэтому должны быть быстрыми: интерфейс, например, только кладёт событие в очередь"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = ()  # Кортеж заменяется целиком, поэтому emit читает его без блокировки
+
+    def subscribe(self, callback, kinds=None):
+        with self.lock:
+            self.subscribers += ((callback, frozenset(kinds) if kinds else None),)
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            self.subscribers = tuple(item for item in self.subscribers if item[0] != callback)
+
+    def emit(self, kind, **fields):
+        subscribers = self.subscribers
+        if not subscribers:  # Без подписчиков событие даже не создаётся
+            return
+        event = Event(kind, **fields)
+        for callback, kinds in subscribers:
+            if kinds is None or kind in kinds:
+                try:
+                    callback(event)
+                except Exception:
+                    pass  # Ошибка одного подписчика не должна останавливать очистку
+
+bus = EventBus()
+emit = bus.emit
+subscribe = bus.subscribe
+unsubscribe = bus.unsubscribe
+
+def message(text):
+    emit(MESSAGE, text=text)
+
+def format_event(event):
+    """Текст события в том виде, в каком его печатала программа"""
+    if event.kind == POST_DELETED:
+        return f"Удален пост {event.post_id} ({event.session_total} в этой сессии)"
+    if event.kind == MEMBER_REMOVED:
+        return f"❌ Удалён подписчик {event.user_id} ({event.session_total}/{event.daily_limit})"
+    if event.kind == MEDIA_DELETED:
+        return f"🖼️ Удалено {event.title}: {event.total}"
+    if event.kind == RATE_LIMITED:
+        if getattr(event, 'message', None):
+            return f"⏳ Лимит запросов ({event.message}). Пауза {event.delay} сек..."
+        return f"⏳ Флуд-контроль. Ждем {event.delay} сек..."
+    if event.kind == LIMIT_REACHED:
+        reset_time = event.reset_time.strftime('%d.%m.%Y %H:%M')
+        if event.limit == 'posts':
+            return f"\nЛимит удаления постов достигнут! Вернитесь после {reset_time}"
+        return f"⚠️ Достигнут дневной лимит удалений! Вернитесь после {reset_time}"
+    return event.text
+
+def print_event(event):
+    print(format_event(event), flush=True)
+
+class FileLog:
+    """Подписчик, дописывающий события с отметкой времени в текстовый файл"""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, event):
+        stamp = datetime.fromtimestamp(event.time).strftime('%Y-%m-%d %H:%M:%S')
+        line = format_event(event).strip('\n').replace('\n', ' ')  # Одно событие - одна строка
+        with self.lock:
+            self.file.write(f"{stamp} [{event.kind}] {line}\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
@@ -1,32 +1,51 @@
 import sys
 import threading
 import queue
+import time
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QWidget, 
-    QLabel, QLineEdit, QPushButton, QTextEdit, QFrame
+    QLabel, QLineEdit, QPushButton, QPlainTextEdit, QFrame, QDoubleSpinBox, QCheckBox
 )
 from PyQt6.QtCore import Qt, QTimer
-import requests
+from PyQt6.QtGui import QFont
 import config
+import events
 from vk_cleaner import main, GracefulInterrupt
+from vk_client import VKClient
 
-class ConsoleText(QTextEdit):
+MAX_LOG_LINES = 5000  # Строк в консоли: старые удаляются, память не растёт на долгих запусках
+PROGRESS_INTERVAL = 2  # Как часто (сек) выводить свёрнутые строки об удалении
+ITEM_EVENTS = (events.POST_DELETED, events.MEMBER_REMOVED)  # События об отдельных удалениях
+
+class ConsoleText(QPlainTextEdit):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.setReadOnly(False)
-        self.setFontFamily("Consolas")
-        self.setFontPointSize(10)
+        self.setMaximumBlockCount(MAX_LOG_LINES)
+        self.setFont(QFont("Consolas", 10))
         self.setStyleSheet("background-color: #2b2b2b; color: white;")
 
+    def append_lines(self, lines):
+        # Одна вставка за раз; прокручиваем вниз, только если пользователь не листает историю
+        bar = self.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum() - 2
+        self.appendPlainText("\n".join(lines))
+        if at_bottom:
+            bar.setValue(bar.maximum())
+
 class VKCleanerApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("VK UnSub & PostDelete")
         self.setGeometry(100, 100, 800, 600)
         
-        self.log_queue = queue.Queue()
+        self.log_queue = queue.Queue()  # События очистки, их выводит таймер в потоке интерфейса
+        self.item_count = 0  # Свёрнутые события об удалениях с последнего вывода прогресса
+        self.last_item = None
+        self.progress_time = time.monotonic()
         self.thread = None
         self.interrupt = GracefulInterrupt()
+        self.clients = {}
         
         self.setup_ui()
         
@@ -51,12 +70,26 @@ class VKCleanerApp(QMainWindow):
         layout.addWidget(self.token_entry)
 
         # ID Группы
-        group_id_label = QLabel("ID Группы:")
+        group_id_label = QLabel("ID Группы (несколько - через запятую):")
         self.group_id_entry = QLineEdit()
-        self.group_id_entry.setText(config.config["GROUP_ID"])
+        self.group_id_entry.setText(", ".join(config.config.get("GROUP_IDS") or []) or config.config["GROUP_ID"])
         layout.addWidget(group_id_label)
         layout.addWidget(self.group_id_entry)
 
+        # Скорость запросов: меняется на лету, после «Сохранить» действует и на запущенную очистку
+        rps_label = QLabel("Запросов в секунду на токен:")
+        self.rps_entry = QDoubleSpinBox()
+        self.rps_entry.setRange(0.1, 3.0)
+        self.rps_entry.setSingleStep(0.5)
+        self.rps_entry.setValue(config.config["API_RPS"])
+        layout.addWidget(rps_label)
+        layout.addWidget(self.rps_entry)
+
+        # Медиафайлы удаляются параллельно с постами и подписчиками
+        self.media_check = QCheckBox("Удалять альбомы, фото, видео и документы")
+        self.media_check.setChecked(config.config["CLEAN_MEDIA"])
+        layout.addWidget(self.media_check)
+
         # Кнопки
         btn_frame = QFrame()
         btn_layout = QVBoxLayout(btn_frame)
@@ -94,10 +127,31 @@ class VKCleanerApp(QMainWindow):
 
     def save_config(self):
         config.config["ACCESS_TOKEN"] = self.token_entry.text()
-        config.config["GROUP_ID"] = self.group_id_entry.text()
+        group_ids = [g.strip() for g in self.group_id_entry.text().split(",") if g.strip()]
+        config.config["GROUP_ID"] = group_ids[0] if group_ids else ""
+        config.config["GROUP_IDS"] = group_ids if len(group_ids) > 1 else []
+        config.config["API_RPS"] = self.rps_entry.value()
+        config.config["CLEAN_MEDIA"] = self.media_check.isChecked()
         config.save_config(config.config)
         self.log("Настройки сохранены!")
 
+    def get_clients(self):
+        # Один клиент на токен: проверка токена и очистка используют общий пул соединений
+        tokens = config.get_tokens(config.config)
+        running = self.thread and self.thread.is_alive()
+        for token in list(self.clients):
+            client = self.clients[token]
+            if token not in tokens or client.dead or client.version != config.config["VERSION"]:
+                if not running:
+                    client.close()
+                del self.clients[token]
+        for token in tokens:
+            if token not in self.clients:
+                self.clients[token] = VKClient.from_config(config.config, token)
+            else:
+                self.clients[token].limiter.update_from_config(config.config)
+        return [self.clients[token] for token in tokens]
+
     def check_token(self):
         token = config.config["ACCESS_TOKEN"]
         if not token:
@@ -105,10 +159,7 @@ class VKCleanerApp(QMainWindow):
             return
             
         try:
-            response = requests.get('https://api.vk.com/method/users.get', 
-                                 params={'access_token': token, 'v': '5.131'},
-                                 timeout=10)
-            data = response.json()
+            data = self.get_clients()[0].call('users.get')
             
             if 'response' in data:
                 self.log(f"✓ Токен действителен! ID: {data['response'][0]['id']}")
@@ -127,7 +178,7 @@ class VKCleanerApp(QMainWindow):
             self.log(f"! Ошибка проверки: {str(e)}")
 
     def start_cleaner(self):
-        if not config.config["GROUP_ID"]:
+        if not config.get_group_ids(config.config):
             self.log("Ошибка: введите ID группы!")
             return
             
@@ -135,46 +186,67 @@ class VKCleanerApp(QMainWindow):
             self.log("Процесс уже запущен!")
             return
             
-        self.interrupt.interrupted = False
-        self.thread = threading.Thread(target=self.run_cleaner, daemon=True)
+        self.interrupt.reset()
+        self.thread = threading.Thread(target=self.run_cleaner, args=(self.get_clients(),), daemon=True)
         self.thread.start()
 
     def stop_cleaner(self):
-        self.interrupt.interrupted = True
+        self.interrupt.handler()
         self.log("Запрошена остановка...")
 
-    def run_cleaner(self):
-        old_stdout = sys.stdout
-        sys.stdout = self
-        
+    def run_cleaner(self, clients):
+        # Рабочий поток только кладёт события в очередь, текст из них собирает таймер
+        events.subscribe(self.log_queue.put)
         try:
-            main(self.interrupt)
+            main(self.interrupt, clients)
         except Exception as e:
             self.log(f"Ошибка: {str(e)}")
         finally:
-            sys.stdout = old_stdout
-
-    def write(self, text):
-        self.log_queue.put(text)
-
-    def flush(self):
-        pass
+            events.unsubscribe(self.log_queue.put)
 
     def process_queue(self):
-        while not self.log_queue.empty():
-            text = self.log_queue.get()
-            self.log_text.insertPlainText(text)
-            self.log_text.verticalScrollBar().setValue(
-                self.log_text.verticalScrollBar().maximum()
-            )
+        # Всё накопленное за тик выводится одной вставкой
+        compact = config.config.get("COMPACT_LOG", True)
+        lines = []
+        while True:
+            try:
+                event = self.log_queue.get_nowait()
+            except queue.Empty:
+                break
+            # События об отдельных удалениях заменяются периодической строкой прогресса
+            if compact and event.kind in ITEM_EVENTS:
+                self.item_count += 1
+                self.last_item = event
+                continue
+            if self.item_count:  # Прогресс печатаем раньше следующего сообщения, чтобы не нарушить порядок
+                lines.append(self.progress_line())
+            lines.extend(events.format_event(event).split("\n"))
+
+        if self.item_count and time.monotonic() - self.progress_time >= PROGRESS_INTERVAL:
+            lines.append(self.progress_line())
+        if lines:
+            self.log_text.append_lines(lines)
+
+    def progress_line(self):
+        line = f"📈 +{self.item_count} | {events.format_event(self.last_item)}"
+        self.item_count = 0
+        self.progress_time = time.monotonic()
+        return line
 
     def log(self, message):
-        self.log_text.insertPlainText(message + "\n")
-        self.log_text.verticalScrollBar().setValue(
-            self.log_text.verticalScrollBar().maximum()
-        )
+        self.log_queue.put(events.Event(events.MESSAGE, text=message))
+
+def cleanup_frozen_cache():
+    # Временный кэш собранного exe удаляется один раз при запуске окна, а не перед каждой очисткой
+    if getattr(sys, 'frozen', False):
+        import os
+        import shutil
+        temp_dir = os.path.join(os.environ.get('TEMP', ''), 'vk_cleaner_cache')
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir)
 
 if __name__ == "__main__":
+    cleanup_frozen_cache()
     app = QApplication(sys.argv)
     window = VKCleanerApp()
     window.show()
@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+FIELDS = ('posts_deleted', 'users_deleted', 'last_post_reset', 'last_user_reset')
+
+def get_next_day_reset(last_reset_timestamp):
+    """Возвращает 00:01 следующего дня для подписчиков"""
+    last_reset_date = datetime.fromtimestamp(last_reset_timestamp).date()
+    return datetime.combine(last_reset_date + timedelta(days=1), datetime.min.time().replace(minute=1))
+
+def apply_resets(limits, current_time):
+    # Для постов (оставляем часовой сброс)
+    if current_time - limits['last_post_reset'] > 3600:
+        limits['posts_deleted'] = 0
+        limits['last_post_reset'] = current_time  # Сброс по фактическому времени
+
+    # Для подписчиков (суточный сброс в 00:01)
+    next_reset = get_next_day_reset(limits['last_user_reset'])
+    if current_time >= next_reset.timestamp():
+        limits['users_deleted'] = 0
+        limits['last_user_reset'] = int(next_reset.timestamp())
+    return limits
+
+class LimitsStore:
+    """Счётчики лимитов в SQLite (WAL): каждое изменение - отдельная транзакция.
+
+    BEGIN IMMEDIATE берёт блокировку записи на всю базу, поэтому несколько процессов
+    и потоков, работающих с одним файлом, не затирают счётчики друг друга.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS limits (
+                key TEXT PRIMARY KEY,
+                posts_deleted INTEGER NOT NULL,
+                users_deleted INTEGER NOT NULL,
+                last_post_reset REAL NOT NULL,
+                last_user_reset REAL NOT NULL)""")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def _update(self, key, field=None, amount=0, seed=None):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute(f"SELECT {', '.join(FIELDS)} FROM limits WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    limits = dict(zip(FIELDS, row))
+                else:
+                    limits = {
+                        'users_deleted': 0,
+                        'posts_deleted': 0,
+                        'last_user_reset': int(time.time()),
+                        'last_post_reset': int(time.time())
+                    }
+                    # Начальные значения (например, из JSON прежних версий) переносим только известные поля
+                    initial = (seed() if seed else None) or {}
+                    limits.update({name: initial[name] for name in FIELDS if name in initial})
+                apply_resets(limits, time.time())
+                if field:
+                    limits[field] += amount
+                self.db.execute(f"INSERT OR REPLACE INTO limits (key, {', '.join(FIELDS)}) VALUES (?, ?, ?, ?, ?)",
+                                (key, *(limits[name] for name in FIELDS)))
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return limits
+
+    def read(self, key, seed=None):
+        """Текущие счётчики с учётом часового и суточного сброса. seed() даёт начальные значения"""
+        # Обычное чтение без блокировки записи: пишем, только если строки нет или наступил сброс
+        with self.lock:
+            row = self.db.execute(f"SELECT {', '.join(FIELDS)} FROM limits WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            limits = dict(zip(FIELDS, row))
+            if apply_resets(dict(limits), time.time()) == limits:
+                return limits
+        return self._update(key, seed=seed)
+
+    def add(self, key, field, amount=1):
+        return self._update(key, field, amount)
+
+class Limits(dict):
+    """Счётчики одной группы/токена. Изменения сразу записываются в хранилище"""
+
+    def __init__(self, store, key, seed=None):
+        super().__init__(store.read(key, seed))
+        self.store = store
+        self.key = key
+
+    def refresh(self):
+        # Подтягиваем удаления, сделанные другими процессами
+        self.update(self.store.read(self.key))
+        return self
+
+    def add(self, field, amount=1):
+        if amount:
+            self.update(self.store.add(self.key, field, amount))
@@ -0,0 +1,147 @@
+import config
+import events
+from rate_limiter import RateLimiter
+from work_journal import WorkJournal
+from vk_cleaner import delete_batch, execute_batch, get_batch_size, process_journal, snapshot_items
+
+# Как получить и как удалить каждый вид медиафайлов.
+# Альбомы идут первыми: удаление альбома удаляет и все его фото
+MEDIA_TYPES = {
+    'album': {
+        'title': 'альбомов',
+        'list': 'photos.getAlbums',
+        'count': 100,
+        'delete': 'photos.deleteAlbum',
+        'params': lambda group_id, item_id: {'group_id': abs(group_id), 'album_id': item_id},
+    },
+    'photo': {
+        'title': 'фото',
+        'list': 'photos.getAll',
+        'count': 200,
+        'delete': 'photos.delete',
+        'params': lambda group_id, item_id: {'owner_id': group_id, 'photo_id': item_id},
+    },
+    'video': {
+        'title': 'видео',
+        'list': 'video.get',
+        'count': 200,
+        'delete': 'video.delete',
+        'params': lambda group_id, item_id: {'owner_id': group_id, 'video_id': item_id},
+    },
+    'doc': {
+        'title': 'документов',
+        'list': 'docs.get',
+        'count': 2000,
+        'delete': 'docs.delete',
+        'params': lambda group_id, item_id: {'owner_id': group_id, 'doc_id': item_id},
+    },
+}
+
+# Запросов execute в секунду для каждого вида, если в MEDIA_RPS не указано иное
+MEDIA_REQUESTS_PER_SECOND = 1
+
+def get_media_limiter():
+    """Отдельные корзины для каждого вида медиа, чтобы фото не забирали весь лимит у видео и документов"""
+    rates = {kind: MEDIA_REQUESTS_PER_SECOND for kind in MEDIA_TYPES}
+    rates.update(config.config.get("MEDIA_RPS") or {})
+    return RateLimiter(sum(rates.values()), rates, config.config.get("FLOOD_DELAY", 10),
+                       config.config.get("API_RETRY_LIMIT", 3))
+
+def fetch_media_page(client, group_id, kind, offset, interrupt):
+    """Загружает страницу медиафайлов. Пустой список - больше нет, None - страница не получена"""
+    spec = MEDIA_TYPES[kind]
+    if interrupt.interrupted:
+        return None
+
+    response = client.request(spec['list'], {
+        'owner_id': group_id,
+        'offset': offset,
+        'count': spec['count']
+    }, interrupt)
+
+    if not response:
+        return None
+
+    if 'error' in response:
+        error = response['error']
+        # Раздел отключён или нет прав - удалять нечего
+        events.emit(events.ERROR, code=error.get('error_code'), group_id=group_id,
+                    text=f"⛔ Не удалось получить список {spec['title']}: {error.get('error_msg', 'Неизвестная ошибка')}")
+        return []
+
+    # Страница целиком: по её длине считается следующий offset, чужие файлы отсеивает snapshot_media
+    return response.get('response', {}).get('items', [])
+
+def snapshot_media(client, journal, group_id, kind, interrupt):
+    # Чужие видео и фото, добавленные в группу, удаляются только их владельцами
+    return snapshot_items(journal, group_id, kind,
+                          lambda offset: fetch_media_page(client, group_id, kind, offset, interrupt),
+                          lambda items: [item['id'] for item in items if item.get('owner_id', group_id) == group_id],
+                          interrupt)
+
+def call_each(client, method, params_list, interrupt):
+    """То же, что execute_batch, но отдельным запросом на каждый элемент"""
+    return [client.request(method, params, interrupt) for params in params_list]
+
+def delete_media_batch(client, limiter, group_id, kind, item_ids, interrupt, failed=None):
+    """Удаляет пачку медиафайлов одного вида, возвращает ID удалённых"""
+    spec = MEDIA_TYPES[kind]
+
+    def report(item_id, error):
+        events.emit(events.ERROR, code=error.get('error_code'), group_id=group_id, item_id=item_id,
+                    text=f"⛔ Ошибка при удалении {spec['title']} {item_id}: {error.get('error_msg', 'Неизвестная ошибка')}")
+
+    deleted, errors = delete_batch(client, spec['delete'], list(item_ids), lambda item_id: spec['params'](group_id, item_id),
+                                   report, interrupt,
+                                   call=execute_batch if config.config.get("USE_EXECUTE", True) else call_each,
+                                   limiter=limiter, bucket=kind)
+    if failed is not None:
+        failed.extend(errors)
+    return deleted
+
+def delete_media_from_journal(client, limiter, journal, group_id, kind, interrupt):
+    title = MEDIA_TYPES[kind]['title']
+    batch_size = get_batch_size() if config.config.get("USE_EXECUTE", True) else 1
+    deleted = 0
+
+    def delete(item_ids, failed):
+        return delete_media_batch(client, limiter, group_id, kind, item_ids, interrupt, failed)
+
+    for done in process_journal(client, journal, group_id, kind, batch_size, delete, interrupt):
+        if done:
+            deleted += len(done)
+            events.emit(events.MEDIA_DELETED, group_id=group_id, media=kind, title=title, count=len(done), total=deleted)
+
+    if not interrupt.interrupted and not client.dead and not journal.remaining(group_id, kind):
+        journal.clear(group_id, kind)
+
+    return deleted
+
+def clean_media(client, group_id, interrupt, journal=None):
+    """Удаляет альбомы, фото, видео и документы группы. Возвращает число удалённых файлов.
+
+    Список каждого вида сначала заносится в журнал (без журнала работ - во временный в памяти),
+    затем удаляется пачками через execute со своим ограничением скорости для каждого вида.
+    """
+    own_journal = journal is None
+    if own_journal:
+        journal = WorkJournal(':memory:')
+    limiter = get_media_limiter()
+    kinds = [kind for kind in MEDIA_TYPES if kind in config.config.get("MEDIA_TYPES", list(MEDIA_TYPES))]
+    deleted = 0
+
+    try:
+        for kind in kinds:
+            if interrupt.interrupted or client.dead:
+                break
+            events.message(f"\n🖼️ Удаление {MEDIA_TYPES[kind]['title']} группы {group_id}...")
+            if snapshot_media(client, journal, group_id, kind, interrupt):
+                deleted += delete_media_from_journal(client, limiter, journal, group_id, kind, interrupt)
+    except Exception as e:
+        events.emit(events.ERROR, code=None, group_id=group_id, text=f"\n🔥 Ошибка при удалении медиафайлов группы {group_id}: {e}")
+    finally:
+        if own_journal:
+            journal.close()
+
+    events.message(f"\nУдалено медиафайлов в группе {group_id}: {deleted}")
+    return deleted
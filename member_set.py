@@ -0,0 +1,96 @@
+import bisect
+import heapq
+from array import array
+
+# Очередь исключения: сначала удалённые и заблокированные страницы, затем давно не заходившие, затем остальные
+DEAD, INACTIVE, ACTIVE = 0, 1, 2
+
+class MemberSet:
+    """Неизменяемое множество ID в отсортированном array('I'): 4 байта на участника
+    вместо объекта Python. Разность и объединение - двоичным поиском и копированием срезов"""
+
+    def __init__(self, ids=()):
+        self.ids = array('I', sorted(set(ids)))
+
+    @classmethod
+    def from_sorted(cls, ids):
+        result = cls.__new__(cls)
+        result.ids = ids
+        return result
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def difference(self, other):
+        return MemberSet.from_sorted(self._merge(other, keep_other=False))
+
+    def union(self, other):
+        if len(other) > len(self):
+            return other.union(self)
+        return MemberSet.from_sorted(self._merge(other, keep_other=True))
+
+    def _merge(self, other, keep_other):
+        """Проход по other (обычно меньшему) с двоичным поиском в self: участки self
+        между найденными позициями копируются срезами массива, без цикла по каждому ID"""
+        a = self.ids
+        result = array('I')
+        start = 0
+        for item_id in other.ids:
+            i = bisect.bisect_left(a, item_id, start)
+            found = i < len(a) and a[i] == item_id
+            result.extend(a[start:i])
+            if keep_other:
+                result.append(item_id)
+            start = i + 1 if found else i
+        result.extend(a[start:])
+        return result
+
+    __sub__ = difference
+    __or__ = union
+
+class MemberCollector:
+    """Накопитель ID при постраничной загрузке. ID сортируются кусками по chunk_size,
+    build() сливает куски потоково - в памяти никогда нет списка всех ID как объектов Python"""
+
+    def __init__(self, chunk_size=65536):
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.current = array('I')
+
+    def __len__(self):
+        return sum(map(len, self.chunks)) + len(self.current)
+
+    def append(self, item_id):
+        self.current.append(item_id)
+        if len(self.current) >= self.chunk_size:
+            self._seal()
+
+    def _seal(self):
+        if self.current:
+            self.chunks.append(array('I', sorted(self.current)))
+            self.current = array('I')
+
+    def build(self):
+        self._seal()
+        result = array('I')
+        previous = None
+        # Участник мог попасть на две страницы, если список сдвинулся во время обхода
+        for item_id in heapq.merge(*self.chunks):
+            if item_id != previous:
+                result.append(item_id)
+                previous = item_id
+        self.chunks = []
+        return MemberSet.from_sorted(result)
+
+def member_priority(member, inactive_before=None):
+    """Место участника в очереди исключения по полям deactivated и last_seen.
+    Скрытое время последнего визита не считается неактивностью"""
+    if member.get('deactivated'):
+        return DEAD
+    seen = (member.get('last_seen') or {}).get('time')
+    if inactive_before and seen and seen < inactive_before:
+        return INACTIVE
+    return ACTIVE
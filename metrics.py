@@ -0,0 +1,213 @@
+import bisect
+import os
+import threading
+import time
+from collections import defaultdict
+
+import events
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # Границы гистограммы задержек, сек
+
+METRICS = {
+    'vk_api_request_seconds': ('histogram', "Длительность HTTP-запроса к VK API"),
+    'vk_api_errors_total': ('counter', "Ошибки VK API по методам и кодам (network - ошибка соединения)"),
+    'vk_sleep_seconds_total': ('counter', "Время ожидания (сумма по потокам): ограничитель скорости, повторы, сброс лимитов"),
+    'vk_backoff_seconds_total': ('counter', "Паузы, назначенные после ошибок 6/9/29"),
+    'vk_items_deleted_total': ('counter', "Удалённые посты, подписчики и медиафайлы"),
+    'vk_items_skipped_total': ('counter', "Элементы из списка неудаляемых, пропущенные без запроса к API"),
+    'vk_limit_reached_total': ('counter', "Сколько раз исчерпан часовой или дневной лимит"),
+    'vk_prefetch_queue_depth': ('gauge', "Страниц в очереди предзагрузки"),
+}
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя ячейка - значения больше всех границ
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, share):
+        """Верхняя граница ячейки, в которую попадает квантиль (приближённо, как в Prometheus)"""
+        rank = share * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float('inf')
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+def format_value(value):
+    return "+Inf" if value == float('inf') else f"{value:g}"
+
+class Metrics:
+    """Счётчики, гистограммы и датчики процесса. Значения только растут (кроме датчиков),
+    поэтому их можно собирать Prometheus через текстовый файл или HTTP"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.exporter = None
+        self.server = None
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def adjust(self, name, delta, **labels):
+        # Датчик, который несколько потоков меняют одновременно (например, общая глубина очередей)
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    def on_event(self, event):
+        """Подписчик шины событий: удаления, паузы и лимиты"""
+        if event.kind == events.POST_DELETED:
+            self.inc('vk_items_deleted_total', kind='post')
+        elif event.kind == events.MEMBER_REMOVED:
+            self.inc('vk_items_deleted_total', kind='member')
+        elif event.kind == events.MEDIA_DELETED:
+            self.inc('vk_items_deleted_total', event.count, kind=event.media)
+        elif event.kind == events.RATE_LIMITED:
+            self.inc('vk_backoff_seconds_total', event.delay, code=event.code)
+        elif event.kind == events.LIMIT_REACHED:
+            self.inc('vk_limit_reached_total', limit=event.limit)
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus"""
+        with self.lock:
+            histograms = {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in self.histograms.items()}
+            values = dict(self.counters)
+            values.update(self.gauges)
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'histogram':
+                for (metric, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(list(buckets) + [float('inf')], counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{format_labels(labels, [('le', format_value(bound))])} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {total:g}")
+                    lines.append(f"{name}_count{format_labels(labels)} {count}")
+            else:
+                for (metric, labels), value in sorted(values.items(), key=lambda item: str(item[0])):
+                    if metric == name:
+                        lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # Через временный файл, чтобы сборщик не прочитал половину
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+    def start_export(self, path=None, port=None, interval=10):
+        """Периодическая запись в файл и/или HTTP-адрес http://127.0.0.1:port/metrics"""
+        with self.lock:
+            if path and self.exporter is None:
+                def loop():
+                    while True:
+                        try:
+                            self.write(path)
+                        except OSError:
+                            pass
+                        time.sleep(interval)
+
+                self.exporter = threading.Thread(target=loop, daemon=True)
+                self.exporter.start()
+
+            if port and self.server is None:
+                from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+                registry = self
+
+                class Handler(BaseHTTPRequestHandler):
+                    def log_message(self, *args):
+                        pass
+
+                    def do_GET(self):
+                        body = registry.render().encode('utf-8')
+                        self.send_response(200)
+                        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                        self.send_header('Content-Length', str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+
+                self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+                self.server.daemon_threads = True
+                threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def checkpoint(self):
+        """Снимок значений: summary(снимок) покажет только то, что накопилось после него"""
+        with self.lock:
+            histograms = {key: (list(h.counts), h.sum, h.count) for key, h in self.histograms.items()}
+            return time.time(), histograms, dict(self.counters)
+
+    def summary(self, since=None):
+        """Строки итогов для вывода в конце запуска. since - снимок checkpoint() в начале запуска,
+        без него итоги считаются с начала работы процесса"""
+        started, base_histograms, base_counters = since or (self.started, {}, {})
+        with self.lock:
+            histograms = {}
+            for key, current in self.histograms.items():
+                counts, total_sum, count = base_histograms.get(key, ([0] * len(current.counts), 0.0, 0))
+                if current.count > count:
+                    # Счётчики Prometheus только растут, итоги запуска - разница со снимком
+                    histogram = histograms[key] = Histogram(current.buckets)
+                    histogram.counts = [now - before for now, before in zip(current.counts, counts)]
+                    histogram.sum = current.sum - total_sum
+                    histogram.count = current.count - count
+            counters = {key: value - base_counters.get(key, 0) for key, value in self.counters.items()
+                        if value > base_counters.get(key, 0)}
+
+        def total(name):
+            return sorted(((dict(labels), value) for (metric, labels), value in counters.items() if metric == name),
+                          key=lambda item: str(item[0]))
+
+        lines = [f"⏱️ Время работы: {time.time() - started:.0f} сек"]
+        for (name, labels), histogram in sorted(histograms.items()):
+            method = dict(labels).get('method', '')
+            lines.append(f"   {method}: {histogram.count} запросов, в сети {histogram.sum:.1f} сек, "
+                         f"p50 ≤ {format_value(histogram.quantile(0.5))} сек, p99 ≤ {format_value(histogram.quantile(0.99))} сек")
+        errors = total('vk_api_errors_total')
+        if errors:
+            lines.append("❗ Ошибки API: " + ", ".join(
+                f"{labels['method']} [{labels['code']}]: {value:.0f}" for labels, value in errors))
+        sleeps = total('vk_sleep_seconds_total')
+        if sleeps:
+            lines.append("💤 Ожидание: " + ", ".join(f"{labels['reason']} {value:.1f} сек" for labels, value in sleeps))
+        skipped = total('vk_items_skipped_total')
+        if skipped:
+            lines.append("⏭️ Пропущено без запроса: " + ", ".join(f"{labels['kind']} {value:.0f}" for labels, value in skipped))
+        backoff = sum(value for labels, value in total('vk_backoff_seconds_total'))
+        if backoff:
+            lines.append(f"⏳ Паузы после ошибок 6/9/29: {backoff:.0f} сек")
+        return lines
+
+metrics = Metrics()
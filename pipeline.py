@@ -0,0 +1,55 @@
+import queue
+import threading
+from metrics import metrics
+
+_DONE = object()
+
+def prefetch_pages(fetch_page, interrupt, depth=2):
+    """Генератор страниц: следующие страницы загружаются в фоне, пока обрабатывается текущая.
+
+    fetch_page(offset) возвращает список элементов; пустой список или None завершает загрузку.
+    Очередь ограничена depth страницами, чтобы загрузчик не убегал далеко вперёд.
+    """
+    pages = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.2)
+                metrics.adjust('vk_prefetch_queue_depth', 1)
+                return True
+            except queue.Full:
+                if interrupt.interrupted:
+                    return False
+        return False
+
+    def producer():
+        offset = 0
+        try:
+            while not stop.is_set() and not interrupt.interrupted:
+                items = fetch_page(offset)
+                if not items or not put(items):
+                    break
+                offset += len(items)
+        finally:
+            put(_DONE)
+
+    fetcher = threading.Thread(target=producer, daemon=True)
+    fetcher.start()
+
+    try:
+        while not interrupt.interrupted:
+            try:
+                page = pages.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            metrics.adjust('vk_prefetch_queue_depth', -1)
+            if page is _DONE:
+                break
+            yield page
+    finally:
+        # Потребитель остановился (лимит, прерывание или конец данных) - останавливаем загрузчик
+        stop.set()
+        fetcher.join(timeout=1)
+        metrics.adjust('vk_prefetch_queue_depth', -pages.qsize())
@@ -0,0 +1,142 @@
+import threading
+import time
+from metrics import metrics
+from retry import RetryPolicy
+
+VK_REQUESTS_PER_SECOND = 3  # Документированный потолок VK для пользовательского токена
+THROTTLE_ERRORS = (6, 9, 29)  # Too many requests / Flood control / Rate limit reached
+
+class TokenBucket:
+    """Корзина токенов с адаптивной скоростью: разгоняется при успехах, замедляется при ошибках"""
+
+    def __init__(self, rate, max_rate=None, min_rate=0.1, capacity=None):
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Забирает токен, если он есть. Иначе возвращает время ожидания в секундах"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def speed_up(self):
+        # Аддитивный рост: +5% от потолка за каждый успешный запрос
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def set_max_rate(self, max_rate):
+        # Новый потолок из настроек: текущая скорость не выше потолка
+        with self.lock:
+            self.max_rate = max_rate
+            self.rate = min(self.rate, max_rate)
+            self.capacity = max(1.0, max_rate)
+
+    def slow_down(self, pause):
+        # Мультипликативное снижение и пауза для всех потоков, использующих корзину
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+
+class RateLimiter:
+    """Общий лимит запросов на токен плюс отдельные корзины для каждого метода API"""
+
+    def __init__(self, requests_per_second=VK_REQUESTS_PER_SECOND, method_rates=None, flood_delay=10, retry_limit=3):
+        self.requests_per_second = requests_per_second
+        self.method_rates = method_rates or {}
+        self.policy = RetryPolicy(retry_limit, flood_delay)  # Паузы и число повторов после ошибок
+        self.total = TokenBucket(requests_per_second)
+        self.methods = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get("API_RPS", VK_REQUESTS_PER_SECOND),
+                   config.get("METHOD_RPS", {}),
+                   config.get("FLOOD_DELAY", 10),
+                   config.get("API_RETRY_LIMIT", 3))
+
+    def configure(self, requests_per_second, method_rates=None, flood_delay=None, retry_limit=None):
+        """Меняет потолки на лету, без пересоздания клиента"""
+        with self.lock:
+            self.requests_per_second = requests_per_second
+            self.method_rates = method_rates or {}
+            if flood_delay is not None:
+                self.policy.flood_delay = flood_delay
+            if retry_limit is not None:
+                self.policy.max_attempts = retry_limit
+            self.total.set_max_rate(requests_per_second)
+            for method, bucket in self.methods.items():
+                bucket.set_max_rate(self.method_rate(method))
+
+    def update_from_config(self, config, changed=None):
+        if changed is None or changed & {"API_RPS", "METHOD_RPS", "FLOOD_DELAY", "API_RETRY_LIMIT"}:
+            self.configure(config.get("API_RPS", VK_REQUESTS_PER_SECOND),
+                           config.get("METHOD_RPS", {}),
+                           config.get("FLOOD_DELAY", 10),
+                           config.get("API_RETRY_LIMIT", 3))
+
+    def method_rate(self, method):
+        return min(self.method_rates.get(method, self.requests_per_second), self.requests_per_second)
+
+    def bucket(self, method):
+        with self.lock:
+            if method not in self.methods:
+                self.methods[method] = TokenBucket(self.method_rate(method))
+            return self.methods[method]
+
+    def acquire(self, method, interrupt):
+        """Ждёт разрешения на запрос. Возвращает False, если во время ожидания пришло прерывание"""
+        buckets = (self.bucket(method), self.total)
+        slept = 0.0
+        try:
+            while True:
+                if interrupt.interrupted:
+                    return False
+                # Токен общей корзины берём только после того, как освободился метод
+                wait = buckets[0].reserve()
+                if not wait:
+                    wait = buckets[1].reserve()
+                    if not wait:
+                        return True
+                    buckets[0].refund()  # Общая корзина пока пуста - возвращаем токен метода
+                # Остановка будит поток сразу, не дожидаясь конца паузы
+                started = time.monotonic()
+                interrupt.wait(wait)
+                slept += time.monotonic() - started
+        finally:
+            if slept:
+                metrics.inc('vk_sleep_seconds_total', slept, reason='rate_limit')
+
+    def success(self, method):
+        self.bucket(method).speed_up()
+        self.total.speed_up()
+
+    def backoff(self, method, error_code, attempt=0):
+        """Замедляет метод после ошибки 6/9/29 и возвращает назначенную паузу в секундах.
+        attempt - номер повтора: пауза растёт экспоненциально до потолка из правил RetryPolicy"""
+        pause = self.policy.delay(error_code, attempt)
+        if error_code == 6:  # Слишком много запросов в секунду - касается всего токена
+            self.total.slow_down(pause)
+        self.bucket(method).slow_down(pause)
+        return round(pause)
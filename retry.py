@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+from collections import deque
+
+import events
+from metrics import metrics
+
+NETWORK_ERROR = 'network'  # Исключение при запросе: таймаут, обрыв соединения, неверный JSON
+FATAL_ERRORS = (4, 5)  # Токен недействителен - повторять бессмысленно, клиент отключается
+PERMANENT_ERRORS = (7, 15, 18, 100, 203)  # Нет прав, удалён, неверные параметры - ответ не изменится
+
+# Временные ошибки: код -> (начальная пауза, потолок паузы в секундах, число повторов).
+# Пауза удваивается с каждой попыткой. Для 9 начальная пауза берётся из FLOOD_DELAY,
+# число повторов None - из API_RETRY_LIMIT
+TRANSIENT_ERRORS = {
+    NETWORK_ERROR: (1, 60, None),
+    1: (2, 60, None),    # Unknown error
+    6: (2, 10, 10),      # Too many requests per second
+    9: (None, 300, 5),   # Flood control
+    10: (2, 60, None),   # Internal server error
+    29: (10, 300, 5),    # Rate limit reached
+}
+
+def is_transient(code):
+    return code in TRANSIENT_ERRORS
+
+class RetryPolicy:
+    """Правила повторов: какие ошибки повторять, сколько раз и с какой паузой"""
+
+    def __init__(self, max_attempts=3, flood_delay=10, rules=None):
+        self.max_attempts = max_attempts
+        self.flood_delay = flood_delay
+        self.rules = dict(TRANSIENT_ERRORS, **(rules or {}))
+
+    def should_retry(self, code, attempt):
+        """attempt - сколько повторов уже сделано"""
+        if code not in self.rules:
+            return False
+        limit = self.rules[code][2]
+        return attempt < (self.max_attempts if limit is None else limit)
+
+    def delay(self, code, attempt):
+        """Экспоненциальная пауза с потолком и случайной добавкой, чтобы потоки не повторяли разом"""
+        base, cap, _ = self.rules.get(code, TRANSIENT_ERRORS[NETWORK_ERROR])
+        if base is None:
+            base = self.flood_delay
+        pause = min(cap, base * 2 ** attempt)
+        return pause / 2 + random.uniform(0, pause / 2)
+
+def sleep(seconds, interrupt, reason='retry'):
+    """Пауза, которую прерывает остановка. False - пауза прервана"""
+    start = time.monotonic()
+    interrupted = interrupt.wait(max(0, seconds))
+    metrics.inc('vk_sleep_seconds_total', time.monotonic() - start, reason=reason)
+    return not interrupted
+
+class CircuitBreaker:
+    """Общий для всех потоков выключатель: если доля временных ошибок за окно превышает порог,
+    все запросы ждут паузу. После паузы первый же результат решает - работать дальше
+    или снова ждать, уже вдвое дольше (до max_cooldown)"""
+
+    def __init__(self, error_rate=0.5, window=60, min_requests=20, cooldown=30, max_cooldown=300):
+        self.error_rate = error_rate
+        self.window = window
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.next_cooldown = cooldown
+        self.results = deque()
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False  # Пауза закончилась, ждём результата пробного запроса
+        self.lock = threading.Lock()
+
+    def configure(self, error_rate=None, cooldown=None):
+        with self.lock:
+            if error_rate is not None:
+                self.error_rate = error_rate
+            if cooldown is not None:
+                self.cooldown = self.next_cooldown = cooldown
+                self.max_cooldown = max(self.max_cooldown, cooldown)
+
+    def update_from_config(self, config, changed=None):
+        if changed is None or changed & {"BREAKER_ERROR_RATE", "BREAKER_COOLDOWN"}:
+            self.configure(config.get("BREAKER_ERROR_RATE", 0.5), config.get("BREAKER_COOLDOWN", 30))
+
+    def record(self, ok):
+        """Результат запроса: ok=False для сетевых и временных ошибок VK"""
+        now = time.monotonic()
+        with self.lock:
+            if self.probing:
+                self.probing = False
+                if ok:
+                    self.next_cooldown = self.cooldown
+                    return
+                pause = self._open(now)
+            else:
+                self.results.append((now, ok))
+                self.failures += not ok
+                while self.results and now - self.results[0][0] > self.window:
+                    self.failures -= not self.results.popleft()[1]
+                if len(self.results) < self.min_requests or self.failures / len(self.results) < self.error_rate:
+                    return
+                pause = self._open(now)
+        events.emit(events.ERROR, code=None,
+                    text=f"🚧 Слишком много ошибок VK. Все запросы приостановлены на {round(pause)} сек")
+
+    def _open(self, now):
+        pause = self.next_cooldown
+        self.open_until = now + pause
+        self.next_cooldown = min(self.max_cooldown, pause * 2)
+        self.results.clear()
+        self.failures = 0
+        self.probing = True
+        return pause
+
+    def wait(self, interrupt):
+        """Ждёт, пока выключатель замкнут. False - ожидание прервано"""
+        remaining = self.open_until - time.monotonic()
+        if remaining <= 0:
+            return not interrupt.interrupted
+        return sleep(remaining, interrupt, reason='circuit_breaker')
+
+# Один выключатель на процесс: ошибки на стороне VK касаются всех токенов и групп
+breaker = CircuitBreaker()
@@ -0,0 +1,185 @@
+import heapq
+import time
+from datetime import datetime
+
+import config
+import events
+from limits_store import get_next_day_reset
+
+POST_WINDOW = 3600
+MEMBER_WINDOW = 86400
+# Пауза этапа после запуска без продвижения при открытом окне: растёт вдвое до предела, сбрасывается при продвижении
+STALL_DELAY = 60
+MAX_STALL_DELAY = 1800
+
+# Этап журнала -> (лимит в конфиге, счётчик удалений, длина окна, название)
+STAGES = {
+    'post': ("MAX_POSTS_PER_HOUR", 'posts_deleted', POST_WINDOW, "посты"),
+    'member': ("MAX_USERS_PER_DAY", 'users_deleted', MEMBER_WINDOW, "подписчики"),
+}
+
+def window_reset(kind, limits):
+    """Начало следующего окна лимита: через час после сброса для постов, 00:01 следующего дня для подписчиков"""
+    if kind == 'post':
+        return limits['last_post_reset'] + POST_WINDOW
+    return get_next_day_reset(limits['last_user_reset']).timestamp()
+
+def finish_time(remaining, quotas, cap, period, now, rate=None):
+    """Когда будет удалён последний из remaining элементов.
+
+    quotas - [(остаток в текущем окне, начало следующего окна)] по токенам, в каждом новом
+    окне токен получает cap удалений. rate - удалений в секунду внутри окна (None - мгновенно).
+    None - работа не закончится никогда (нет токенов или лимит нулевой).
+    """
+    if remaining <= 0:
+        return now
+    duration = lambda count: count / rate if rate else 0
+    available = sum(quota for quota, _ in quotas)
+    if available >= remaining:
+        return now + duration(remaining)
+    if cap <= 0 or not quotas:
+        return None
+    remaining -= available
+    # Целые круги, когда каждый токен получает новое окно, пропускаем сразу, без перебора
+    rounds = max(0, (remaining - 1) // (cap * len(quotas)) - 1)
+    remaining -= rounds * cap * len(quotas)
+    resets = [reset + rounds * period for _, reset in quotas]
+    heapq.heapify(resets)
+    while True:
+        moment = heapq.heappop(resets)
+        if remaining <= cap:
+            return max(moment, now) + duration(remaining)
+        remaining -= cap
+        heapq.heappush(resets, moment + period)
+
+def format_time(moment):
+    return datetime.fromtimestamp(moment).strftime('%d.%m.%Y %H:%M')
+
+class StagePlan:
+    """Состояние одного этапа группы: сколько осталось, сколько можно удалить сейчас и когда закончим"""
+
+    def __init__(self, group_id, kind, remaining, available, reset, finish):
+        self.group_id = group_id
+        self.kind = kind
+        self.remaining = remaining  # None - список ещё не составлен, объём неизвестен
+        self.available = available  # Удалений, доступных всем токенам в текущих окнах
+        self.reset = reset          # Ближайшее открытие нового окна среди токенов
+        self.finish = finish        # Прогноз завершения; None - неизвестен
+
+    @property
+    def pending(self):
+        return self.remaining is None or self.remaining > 0
+
+    @property
+    def runnable(self):
+        return self.pending and self.available > 0
+
+class Scheduler:
+    """План очистки по группам, этапам и токенам с учётом часового лимита постов и суточного
+    лимита подписчиков.
+
+    Этапы планируются независимо: группа запускается, как только у любого её этапа открыто окно,
+    и выполняет только такие этапы. Пока посты ждут часового сброса, подписчики удаляются, и наоборот.
+    Первыми идут группы с самым поздним прогнозом - общий срок окончания определяют они.
+    Объём работы берётся из журнала, поэтому план есть только в режиме SNAPSHOT_MODE.
+    """
+
+    def __init__(self, group_ids, journal, load_limits):
+        self.group_ids = list(group_ids)
+        self.journal = journal
+        self.load_limits = load_limits  # (group_id, client) -> счётчики группы и токена
+        self.stalled = {}  # (group_id, kind) -> до какого времени не запускать этап без продвижения
+        self.stalls = {}   # (group_id, kind) -> запусков подряд без продвижения
+
+    def remaining(self, group_id, kind):
+        if self.journal.has_snapshot(group_id, kind):
+            return self.journal.remaining(group_id, kind)
+        return 0 if self.journal.is_drained(group_id, kind) else None
+
+    def plan(self, clients, now=None):
+        """Список StagePlan по всем группам и этапам"""
+        now = now or time.time()
+        clients = [client for client in clients if not client.dead]
+        # Внутри окна удаления идут пакетами execute, по одному на запрос
+        rate = config.config.get("API_RPS", 3) * config.config.get("BATCH_SIZE", 25) * max(1, len(clients))
+        plans = []
+        for group_id in self.group_ids:
+            limits = [self.load_limits(group_id, client) for client in clients]
+            for kind, (cap_key, counter, period, _) in STAGES.items():
+                cap = config.config[cap_key]
+                quotas = [(max(0, cap - group_limits[counter]), window_reset(kind, group_limits))
+                          for group_limits in limits]
+                available = sum(quota for quota, _ in quotas)
+                reset = min((moment for _, moment in quotas), default=None)
+                if self.stalled.get((group_id, kind), 0) > now:
+                    available = 0
+                    reset = self.stalled[(group_id, kind)]
+                remaining = self.remaining(group_id, kind)
+                finish = None if remaining is None else finish_time(remaining, quotas, cap, period, now, rate)
+                plans.append(StagePlan(group_id, kind, remaining, available, reset, finish))
+        return plans
+
+    def runnable(self, plans):
+        """{group_id: {этапы}} для запуска сейчас. Порядок групп - от самого позднего прогноза.
+        Группы без журнала (объём неизвестен) идут первыми: составить список нужно как можно раньше"""
+        stages = {}
+        for plan in plans:
+            if plan.runnable:
+                stages.setdefault(plan.group_id, set()).add(plan.kind)
+        latest = {}
+        for plan in plans:
+            if plan.pending:
+                finish = float('inf') if plan.remaining is None or plan.finish is None else plan.finish
+                latest[plan.group_id] = max(latest.get(plan.group_id, 0), finish)
+        return {group_id: stages[group_id] for group_id in sorted(stages, key=lambda g: -latest[g])}
+
+    def wake_time(self, plans):
+        """Когда откроется окно у этапа, которому есть что удалять. None - работа закончена"""
+        return min((plan.reset for plan in plans if plan.pending and plan.reset is not None), default=None)
+
+    def update(self, stages, before, after, now=None):
+        """Итоги запуска stages. Этап без продвижения (список не составлен, ничего не удалено
+        при открытом окне) откладывается на растущую паузу, чтобы служба не крутилась в цикле.
+        Окно не ждём: сбой сети не должен оставлять без дела весь суточный лимит"""
+        now = now or time.time()
+        before = {(plan.group_id, plan.kind): plan for plan in before}
+        for plan in after:
+            key = (plan.group_id, plan.kind)
+            if plan.kind not in stages.get(plan.group_id, ()):
+                continue
+            # Сеть, ошибки VK или неудачное составление списка
+            stuck = plan.pending and (plan.remaining is None or (plan.remaining == before[key].remaining
+                                                                 and plan.available == before[key].available))
+            if not stuck or plan.available == 0:
+                # Продвинулись, закончили или исчерпали окно - до сброса этап и так не запустится
+                self.stalls.pop(key, None)
+                self.stalled.pop(key, None)
+                continue
+            self.stalled[key] = now + min(MAX_STALL_DELAY, STALL_DELAY * 2 ** self.stalls.get(key, 0))
+            self.stalls[key] = self.stalls.get(key, 0) + 1
+
+    def report(self, plans):
+        """Выводит план: остаток по этапам и прогноз завершения"""
+        pending = [plan for plan in plans if plan.pending]
+        if not pending:
+            events.message("\n🗓️ План: работы не осталось")
+            return
+        events.message("\n🗓️ План очистки:")
+        for plan in pending:
+            name = STAGES[plan.kind][3]
+            if plan.remaining is None:
+                events.message(f"   Группа {plan.group_id}, {name}: список ещё не составлен")
+                continue
+            if plan.finish is None:
+                when = "не закончится - нет действующих токенов"
+            elif plan.available >= plan.remaining:
+                when = "в этом окне"
+            else:
+                when = f"≈ {format_time(plan.finish)}"
+            window = f"сейчас доступно {plan.available}" if plan.available else \
+                f"окно откроется {format_time(plan.reset)}"
+            events.message(f"   Группа {plan.group_id}, {name}: осталось {plan.remaining}, {window}, закончим {when}")
+        if any(plan.remaining is None or plan.finish is None for plan in pending):
+            events.message("🏁 Срок окончания станет известен, когда будут составлены все списки")
+        else:
+            events.message(f"🏁 Вся работа будет закончена примерно к {format_time(max(plan.finish for plan in pending))}")
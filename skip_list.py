@@ -0,0 +1,59 @@
+import sqlite3
+import threading
+import time
+
+class SkipList:
+    """Постоянный список постов и участников, которые VK отказывается удалять (руководители,
+    чужие посты, нет прав). Запись живёт ttl секунд, пока элемент пропускается без запроса к API.
+
+    Файл общий для процессов (WAL), как и база лимитов.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.lock, self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS skipped (
+                    group_id INTEGER, kind TEXT, item_id INTEGER,
+                    error_code INTEGER, created REAL, expires REAL,
+                    PRIMARY KEY (group_id, kind, item_id)) WITHOUT ROWID""")
+            # Истёкшие записи удаляем сразу: через TTL элемент снова попробуют удалить
+            self.db.execute("DELETE FROM skipped WHERE expires <= ?", (time.time(),))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def add(self, group_id, kind, errors, ttl):
+        """errors - {item_id: код ошибки VK}"""
+        now = time.time()
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO skipped VALUES (?, ?, ?, ?, ?, ?)",
+                                ((group_id, kind, item_id, code, now, now + ttl) for item_id, code in errors.items()))
+
+    def find(self, group_id, kind, item_ids):
+        """Какие из item_ids сейчас в списке"""
+        item_ids = list(item_ids)
+        found = set()
+        now = time.time()
+        with self.lock:
+            # Не больше 500 параметров за запрос: у старых сборок SQLite предел 999
+            for i in range(0, len(item_ids), 500):
+                chunk = item_ids[i:i + 500]
+                rows = self.db.execute(
+                    f"SELECT item_id FROM skipped WHERE group_id = ? AND kind = ? AND expires > ? "
+                    f"AND item_id IN ({', '.join('?' * len(chunk))})",
+                    (group_id, kind, now, *chunk)).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def items(self, group_id, kind):
+        """Все действующие записи группы - для исключения при составлении списка"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT item_id FROM skipped WHERE group_id = ? AND kind = ? AND expires > ?",
+                (group_id, kind, time.time())).fetchall()
+        return [row[0] for row in rows]
@@ -1,139 +1,223 @@
 import json
+import threading
 import time
-import requests
 import config
+import events
+import retry
 import sys
 import os
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from vk_client import VKClient
+from rate_limiter import THROTTLE_ERRORS
+from metrics import metrics
+from pipeline import prefetch_pages
+from limits_store import LimitsStore, Limits, get_next_day_reset
+from work_journal import WorkJournal, PENDING, DONE, FAILED
+from skip_list import SkipList
+from member_set import MemberSet, MemberCollector, member_priority, DEAD, INACTIVE, ACTIVE
+from scheduler import Scheduler
 
-def get_log_path():
+def get_data_path(filename):
     if getattr(sys, 'frozen', False):
         # Если запущен как exe
-        return os.path.join(os.path.dirname(sys.executable), 'vk_limits.log')
+        return os.path.join(os.path.dirname(sys.executable), filename)
     else:
         # Если запущен как скрипт
-        return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vk_limits.log')
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
 
-LOG_FILE = get_log_path()
+def get_log_path():
+    return get_data_path('vk_limits.log')
 
-VK_API_URL = 'https://api.vk.com/method/'
+LOG_FILE = get_log_path()
+LIMITS_DB = get_data_path('vk_limits.db')
+JOURNAL_FILE = get_data_path('vk_journal.db')
+SKIP_DB = get_data_path('vk_skip.db')
 
-def get_next_day_reset(last_reset_timestamp):
-    """Возвращает 00:01 следующего дня для подписчиков"""
-    last_reset_date = datetime.fromtimestamp(last_reset_timestamp).date()
-    return datetime.combine(last_reset_date + timedelta(days=1), datetime.min.time().replace(minute=1))
+EXECUTE_BATCH_LIMIT = 25  # VK допускает не более 25 обращений к API внутри одного execute
+POSTS_PAGE_LIMIT = 100     # Наибольший count для wall.get
+MEMBERS_PAGE_LIMIT = 1000  # Наибольший count для groups.getMembers
 
 class GracefulInterrupt:
+    """Сигнал остановки на threading.Event: handler() сразу будит все паузы
+    и ожидания ответа VK, а не только циклы, которые проверяют флаг"""
+
     def __init__(self):
-        self.interrupted = False
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.waiters = set()  # События ожидающих потоков, которые нужно разбудить при остановке
+
+    @property
+    def interrupted(self):
+        return self.event.is_set()
+
+    @interrupted.setter
+    def interrupted(self, value):
+        if value:
+            self.handler()
+        else:
+            self.reset()
 
     def handler(self):
-        self.interrupted = True
+        self.event.set()
+        with self.lock:
+            waiters = list(self.waiters)
+        for waiter in waiters:
+            waiter.set()
+
+    def reset(self):
+        self.event.clear()
 
-def manage_limits(action, data=None):
-    if action == 'read':
+    def wait(self, timeout=None):
+        """Пауза до timeout секунд. True - пришла остановка"""
+        return self.event.wait(timeout)
+
+    def wait_for(self, done, timeout=None):
+        """Ждёт событие done или остановку. Остановка тоже выставляет done, чтобы разбудить поток"""
+        with self.lock:
+            self.waiters.add(done)
+        try:
+            if self.event.is_set():
+                done.set()
+            done.wait(timeout)
+        finally:
+            with self.lock:
+                self.waiters.discard(done)
+
+def get_limits_path(group_id=None, token_id=None):
+    """JSON-файл лимитов прежних версий - используется только для переноса счётчиков в базу"""
+    if group_id is None:
+        return LOG_FILE
+    suffix = f'_{token_id}' if token_id else ''
+    return os.path.join(os.path.dirname(LOG_FILE), f'vk_limits_{abs(int(group_id))}{suffix}.log')
+
+def read_legacy_limits(group_id, token_id=None):
+    for path in (get_limits_path(group_id, token_id), get_limits_path(group_id), LOG_FILE):
         try:
-            with open(LOG_FILE, 'r') as f:
-                limits = json.load(f)
-            
-            current_time = time.time()
-            # Для постов (оставляем часовой сброс)
-            if current_time - limits['last_post_reset'] > 3600:
-                limits['posts_deleted'] = 0
-                limits['last_post_reset'] = current_time  # Сброс по фактическому времени
-
-            # Для подписчиков (суточный сброс в 00:01)
-            next_reset = get_next_day_reset(limits['last_user_reset'])
-            if current_time >= next_reset.timestamp():
-                limits['users_deleted'] = 0
-                limits['last_user_reset'] = int(next_reset.timestamp())
-                        
-            return limits
+            with open(path, 'r') as f:
+                return json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
-            return {
-                'users_deleted': 0,
-                'posts_deleted': 0,
-                'last_user_reset': int(time.time()),
-                'last_post_reset': int(time.time())
-            }
-    elif action == 'write':
-        with open(LOG_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
-
-def vk_api_request(method, params, interrupt):
-    params.update({
-        'access_token': config.config["ACCESS_TOKEN"],
-        'v': config.config["VERSION"],
-        'timestamp': int(time.time()),
-        'random_id': int(time.time() * 1000)
-    })
-    
-    try:
-        response = requests.get(VK_API_URL + method, params=params, timeout=30)
-        result = response.json()
-        
-        if 'error' in result:
-            error = result['error']
-            error_code = error.get('error_code')
-            
-            # Обработка невалидного токена
-            if error_code == 4:  # User authorization failed
-                print("\n❌ Ошибка: Токен не активен. Получите новый токен по инструкции в приложении")
-                return None
-        
-            # Обработка флуд-контроля и Rate Limit
-            if error_code in [9, 29]:
-                # Динамическая задержка: начнем с 5 сек, удваиваем при каждом повторе (макс 300 сек)
-                current_delay = getattr(vk_api_request, 'current_delay', 5)
-                delay = min(current_delay * 2, 300) if error_code == 29 else 10
-                vk_api_request.current_delay = delay
-                
-                print(f"⏳ Лимит запросов ({error['error_msg']}). Пауза {delay} сек...")
-                for _ in range(delay):
-                    if interrupt.interrupted:
-                        print("🛑 Обнаружено прерывание во время ожидания")
-                        return None
-                    time.sleep(1)
-                
-                return vk_api_request(method, params, interrupt)
-            
-        # Сброс задержки при успешном запросе
-        vk_api_request.current_delay = 5
-        return result
-        
-    except Exception as e:
-        print(f"⚠️ Ошибка соединения: {e}")
+            continue
+    return None
+
+_limits_stores = {}
+_limits_stores_lock = threading.Lock()
+
+def get_limits_store():
+    # Одно соединение на файл базы в процессе, сама база общая для всех процессов
+    with _limits_stores_lock:
+        if LIMITS_DB not in _limits_stores:
+            _limits_stores[LIMITS_DB] = LimitsStore(LIMITS_DB)
+        return _limits_stores[LIMITS_DB]
+
+_skip_lists = {}
+
+def get_skip_list():
+    """Список неудаляемых элементов или None, если он выключен (SKIP_TTL_DAYS = 0)"""
+    if config.config.get("SKIP_TTL_DAYS", 7) <= 0:
         return None
+    with _limits_stores_lock:
+        if SKIP_DB not in _skip_lists:
+            _skip_lists[SKIP_DB] = SkipList(SKIP_DB)
+        return _skip_lists[SKIP_DB]
+
+def drop_skipped(group_id, kind, item_ids, failed=None):
+    """Убирает элементы, которые VK уже отказывался удалять, до запроса к API. Они попадают в failed"""
+    skip_list = get_skip_list()
+    skipped = skip_list.find(group_id, kind, item_ids) if skip_list and item_ids else ()
+    if not skipped:
+        return list(item_ids)
+    metrics.inc('vk_items_skipped_total', len(skipped), kind=kind)
+    if failed is not None:
+        failed.extend(skipped)
+    return [item_id for item_id in item_ids if item_id not in skipped]
+
+def remember_unremovable(group_id, kind, errors):
+    """errors - {item_id: код ошибки}. Запоминаются только постоянные ошибки, после которых повтор бесполезен"""
+    skip_list = get_skip_list()
+    errors = {item_id: code for item_id, code in errors.items() if code in retry.PERMANENT_ERRORS}
+    if skip_list and errors:
+        skip_list.add(group_id, kind, errors, config.config.get("SKIP_TTL_DAYS", 7) * 86400)
+
+def load_limits(group_id, token_id=None):
+    """Счётчики группы (и токена). Каждое удаление сразу записывается в общую базу"""
+    key = f"{abs(int(group_id))}_{token_id}" if token_id else str(abs(int(group_id)))
+    return Limits(get_limits_store(), key, lambda: read_legacy_limits(group_id, token_id))
+
+def execute_batch(client, method, params_list, interrupt):
+    """Выполняет до 25 вызовов method одним запросом execute и возвращает результат для каждого элемента"""
+    calls = ",".join(f"API.{method}({json.dumps(params)})" for params in params_list)
+    result = client.request('execute', {'code': f"return [{calls}];"}, interrupt)
+
+    if not result:
+        return [None] * len(params_list)
+    if 'error' in result:  # Ошибка всего запроса относится к каждому элементу
+        return [result] * len(params_list)
+
+    responses = result.get('response') or []
+    # Неудачные вызовы внутри execute возвращают false, а их ошибки идут по порядку в execute_errors
+    errors = iter(result.get('execute_errors', []))
+    results = []
+    for i in range(len(params_list)):
+        value = responses[i] if i < len(responses) else False
+        if value is False or value is None:
+            error = next(errors, {'error_code': None, 'error_msg': 'Неизвестная ошибка'})
+            metrics.inc('vk_api_errors_total', method=error.get('method', method), code=error.get('error_code'))
+            results.append({'error': error})
+        else:
+            results.append({'response': value})
+    return results
 
-def safe_delete_post(group_id, post_id, limits, interrupt):
+def get_batch_size():
+    return max(1, min(EXECUTE_BATCH_LIMIT, config.config.get("BATCH_SIZE", EXECUTE_BATCH_LIMIT)))
+
+def report_error(group_id, item_id, error, title):
+    events.emit(events.ERROR, code=error.get('error_code'), group_id=group_id, item_id=item_id,
+                text=f"{title}: {error.get('error_msg', 'Неизвестная ошибка')}")
+
+def report_manager(group_id, user_id, error_code):
+    events.emit(events.ERROR, code=error_code, group_id=group_id, item_id=user_id,
+                text=f"⏩ Обнаружен руководитель группы (ID: {user_id}). Удалите его вручную через:\n"
+                     "Управление сообществом → Участники → Исключить")
+
+def safe_delete_post(client, group_id, post_id, limits, interrupt, failed=None):
     if interrupt.interrupted:
         return False
-    if limits['posts_deleted'] >= config.config["MAX_POSTS_PER_HOUR"]:
+    if limits.refresh()['posts_deleted'] >= config.config["MAX_POSTS_PER_HOUR"]:
+        return False
+    if not drop_skipped(group_id, 'post', [post_id], failed):
         return False
     
-    result = vk_api_request('wall.delete', {
+    result = client.request('wall.delete', {
         'owner_id': group_id,
         'post_id': post_id
     }, interrupt)  # Добавлен параметр interrupt
     
     if result and 'response' in result and result['response'] == 1:
-        limits['posts_deleted'] += 1
-        time.sleep(config.config["DELAY"])
+        limits.add('posts_deleted')
         return True
+    if result and failed is not None:  # Ошибка VK, а не сети - повторять бессмысленно
+        failed.append(post_id)
+    if result and 'error' in result:
+        remember_unremovable(group_id, 'post', {post_id: result['error'].get('error_code')})
     return False
 
-def safe_remove_user(group_id, user_id, limits, interrupt):
+def safe_remove_user(client, group_id, user_id, limits, interrupt, failed=None):
     if interrupt.interrupted:
         return False
         
-    if limits['users_deleted'] >= config.config["MAX_USERS_PER_DAY"]:
+    if limits.refresh()['users_deleted'] >= config.config["MAX_USERS_PER_DAY"]:
         return False
     
     # 1. Текущий пользователь (скрипт не может удалить сам себя) - пропускаем БЕЗ сообщения
     if user_id == int(config.config.get("USER_ID", 0)):
+        if failed is not None:
+            failed.append(user_id)
+        return False
+    if not drop_skipped(group_id, 'member', [user_id], failed):
         return False
     
-    result = vk_api_request('groups.removeUser', {
+    result = client.request('groups.removeUser', {
         'group_id': abs(group_id),
         'user_id': user_id
     }, interrupt)
@@ -142,191 +226,918 @@ def safe_remove_user(group_id, user_id, limits, interrupt):
         return False
         
     if result.get('response') == 1:
-        limits['users_deleted'] += 1
-        time.sleep(config.config.get("REQUEST_DELAY", 3))
+        limits.add('users_deleted')
         return True
         
     error = result.get('error', {})
     error_code = error.get('error_code')
+    remember_unremovable(group_id, 'member', {user_id: error_code})
 
+    # Флуд-контроль сюда не доходит: client.request повторяет его сам и при неудаче возвращает None
     if error_code in [100, 15, 7]:  # Админы/создатели
-        print(f"⏩ Обнаружен руководитель группы (ID: {user_id}). Удалите его вручную через:")
-        print("Управление сообществом → Участники → Исключить")
+        report_manager(group_id, user_id, error_code)
+        if failed is not None:
+            failed.append(user_id)
         return False
-    elif error_code == 9:  # Флуд-контроль
-        delay = config.config.get("FLOOD_DELAY", 10)
-        print(f"⏳ Флуд-контроль. Ждем {delay} сек...")
-        time.sleep(delay)
-        return safe_remove_user(group_id, user_id, limits, interrupt)
     else:
-        print(f"⛔ Ошибка при удалении {user_id}: {error.get('error_msg', 'Неизвестная ошибка')}")
+        report_error(group_id, user_id, error, f"⛔ Ошибка при удалении {user_id}")
+        if failed is not None:
+            failed.append(user_id)
         return False
     
-def delete_posts(limits, interrupt):
-    offset = 0
-    count = 100
-    deleted = 0
-    max_attempts = 3
+def delete_batch(client, method, item_ids, make_params, on_error, interrupt, on_deleted=None,
+                 call=execute_batch, limiter=None, bucket='execute'):
+    """Удаляет пачку одним execute и повторяет элементы, упёршиеся во флуд-контроль или лимит метода.
+    Остальные ошибки передаются в on_error(item_id, error), on_deleted(число) вызывается после каждой попытки.
+    limiter и bucket - своя корзина скорости вызывающего (у медиафайлов), иначе паузы берёт limiter клиента.
+    Возвращает ID удалённых и {ID: код ошибки} для элементов, которые VK отказался удалять"""
+    deleted = []
+    errors = {}
     attempts = 0
-    
-    while not interrupt.interrupted and attempts < max_attempts:
-        if limits['posts_deleted'] >= config.config["MAX_POSTS_PER_HOUR"]:
-            reset_time = datetime.fromtimestamp(limits['last_post_reset'] + 3600)
-            print(f"\nЛимит удаления постов достигнут! Вернитесь после {reset_time.strftime('%d.%m.%Y %H:%M')}")
+
+    while item_ids and not interrupt.interrupted and attempts < config.config.get("API_RETRY_LIMIT", 3):
+        if limiter is not None and not limiter.acquire(bucket, interrupt):
             break
-            
-        response = vk_api_request('wall.get', {
-            'owner_id': int(config.config["GROUP_ID"]),
-            'count': count,
-            'offset': offset
-        }, interrupt)  # Добавлен параметр interrupt
-        
-        if not response:
-            attempts += 1
-            time.sleep(5)
+        results = call(client, method, [make_params(item_id) for item_id in item_ids], interrupt)
+
+        flooded = []
+        throttled = 9
+        succeeded = 0
+        for item_id, result in zip(item_ids, results):
+            if not result:
+                continue
+            if result.get('response') == 1:
+                succeeded += 1
+                deleted.append(item_id)
+                continue
+
+            error = result.get('error', {})
+            if error.get('error_code') in THROTTLE_ERRORS:  # Флуд-контроль или лимит метода - повторим позже
+                throttled = error['error_code']
+                flooded.append(item_id)
+            else:
+                on_error(item_id, error)
+                errors[item_id] = error.get('error_code')
+        if on_deleted is not None:
+            on_deleted(succeeded)
+
+        if flooded:
+            delay = (limiter or client.limiter).backoff(bucket, throttled, attempts)
+            events.emit(events.RATE_LIMITED, method=method, code=throttled, delay=delay)
+        elif limiter is not None:
+            limiter.success(bucket)
+        item_ids = flooded
+        attempts += 1
+
+    return deleted, errors
+
+def safe_delete_posts_batch(client, group_id, post_ids, limits, interrupt, failed=None):
+    """Удаляет пачку постов одним execute, возвращает ID удалённых постов.
+    В failed попадают посты, которые VK отказался удалять"""
+    if interrupt.interrupted:
+        return []
+    remaining = config.config["MAX_POSTS_PER_HOUR"] - limits.refresh()['posts_deleted']
+    pending = drop_skipped(group_id, 'post', post_ids, failed)[:max(0, remaining)]
+
+    deleted, errors = delete_batch(
+        client, 'wall.delete', pending, lambda post_id: {'owner_id': group_id, 'post_id': post_id},
+        lambda post_id, error: report_error(group_id, post_id, error, f"⛔ Ошибка при удалении поста {post_id}"),
+        interrupt, on_deleted=lambda count: limits.add('posts_deleted', count))
+    if failed is not None:
+        failed.extend(errors)
+    remember_unremovable(group_id, 'post', errors)
+    return deleted
+
+def safe_remove_users_batch(client, group_id, user_ids, limits, interrupt, failed=None):
+    """Исключает пачку подписчиков одним execute, возвращает ID исключённых.
+    В failed попадают руководители и участники, которых VK отказался исключать"""
+    if interrupt.interrupted:
+        return []
+    own_id = int(config.config.get("USER_ID", 0))
+    if failed is not None and own_id in user_ids:
+        failed.append(own_id)
+    remaining = config.config["MAX_USERS_PER_DAY"] - limits.refresh()['users_deleted']
+    pending = drop_skipped(group_id, 'member', [user_id for user_id in user_ids if user_id != own_id], failed)
+    pending = pending[:max(0, remaining)]
+
+    def report(user_id, error):
+        error_code = error.get('error_code')
+        if error_code in [100, 15, 7]:  # Админы/создатели
+            report_manager(group_id, user_id, error_code)
+        else:
+            report_error(group_id, user_id, error, f"⛔ Ошибка при удалении {user_id}")
+
+    removed, errors = delete_batch(
+        client, 'groups.removeUser', pending, lambda user_id: {'group_id': abs(group_id), 'user_id': user_id},
+        report, interrupt, on_deleted=lambda count: limits.add('users_deleted', count))
+    if failed is not None:
+        failed.extend(errors)
+    remember_unremovable(group_id, 'member', errors)
+    return removed
+
+def fetch_posts_page(client, group_id, offset, count, interrupt):
+    """Загружает страницу постов. Пустой список - постов больше нет, None - страница не получена
+    (повторы после сетевых и временных ошибок уже выполнил client.request)"""
+    if interrupt.interrupted:
+        return None
+
+    response = client.request('wall.get', {
+        'owner_id': group_id,
+        'count': count,
+        'offset': offset
+    }, interrupt)
+
+    if not response:
+        return None
+
+    if 'error' in response:
+        error = response['error']
+        report_error(group_id, None, error, f"⛔ Ошибка API [{error.get('error_code')}]")
+        return None
+
+    if 'items' not in response.get('response', {}):
+        events.message("\nПосты закончились")
+        return []
+
+    items = response['response']['items']
+    if not items:
+        events.message("\nБольше нет постов для удаления")
+    return items
+
+def get_bulk_pages():
+    """Сколько страниц списка читать одним execute при составлении журнала (1 - по запросу на страницу)"""
+    if not config.config.get("USE_EXECUTE", True):
+        return 1
+    return max(1, min(EXECUTE_BATCH_LIMIT, config.config.get("BULK_PAGES", EXECUTE_BATCH_LIMIT)))
+
+def fetch_pages_bulk(client, group_id, method, params, count, interrupt):
+    """fetch_page(offset) для prefetch_pages, читающий до BULK_PAGES страниц по count элементов
+    одним execute. Чтение останавливается на первой неполной странице, а после того как VK сообщил
+    общее число элементов, лишние страницы не запрашиваются. None - страницы получить не удалось"""
+    pages = get_bulk_pages()
+    use_execute = config.config.get("USE_EXECUTE", True)
+    total = None
+
+    def fetch(offset):
+        nonlocal total
+        attempt = 0
+        while not interrupt.interrupted:
+            offsets = [offset + i * count for i in range(pages)]
+            if total is not None:
+                offsets = [page_offset for page_offset in offsets if page_offset < total]
+                if not offsets:
+                    return []
+            calls = [dict(params, offset=page_offset, count=count) for page_offset in offsets]
+            if use_execute:
+                results = execute_batch(client, method, calls, interrupt)
+            else:  # Без execute - страница обычным запросом, как в fetch_posts_page
+                results = [client.request(method, calls[0], interrupt)]
+            items = []
+            for result in results:
+                if not result:  # Запрос не удался, повторы уже выполнил client.request
+                    return items or None
+                if 'error' in result:
+                    if items:  # Остальное дочитает следующий вызов
+                        return items
+                    error = result['error']
+                    error_code = error.get('error_code')
+                    if error_code in THROTTLE_ERRORS and client.limiter.policy.should_retry(error_code, attempt):
+                        delay = client.limiter.backoff('execute', error_code, attempt)
+                        events.emit(events.RATE_LIMITED, method=method, code=error_code, delay=delay)
+                        break
+                    report_error(group_id, None, error, f"⛔ Ошибка API [{error_code}]")
+                    return None
+                page = result['response']
+                total = page.get('count', total)
+                items.extend(page.get('items', []))
+                if len(page.get('items', [])) < count:  # Неполная страница - список закончился
+                    return items
+            else:
+                return items
+            attempt += 1
+        return None
+
+    return fetch
+
+def parse_date(value):
+    """Дата из настроек ("2024-01-31" или "31.01.2024") в отметку времени начала дня. Пусто - None"""
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(str(value).strip(), fmt).timestamp()
+        except ValueError:
             continue
-            
-        if 'items' not in response.get('response', {}):
-            print("\nПосты закончились")
+    raise ValueError(f"неверная дата {value!r}, ожидается ГГГГ-ММ-ДД или ДД.ММ.ГГГГ")
+
+def get_post_dates():
+    """Границы (после, до) из POSTS_AFTER и POSTS_BEFORE или None, если удаляется вся стена"""
+    after = parse_date(config.config.get("POSTS_AFTER"))
+    before = parse_date(config.config.get("POSTS_BEFORE"))
+    return None if after is None and before is None else (after, before)
+
+def post_in_dates(post, dates):
+    after, before = dates
+    return (after is None or post['date'] >= after) and (before is None or post['date'] < before)
+
+def probe_post(client, group_id, offset, interrupt):
+    """Один пост по смещению: (всего постов, пост или None). None - запрос не удался"""
+    response = client.request('wall.get', {'owner_id': group_id, 'count': 1, 'offset': offset}, interrupt)
+    if not response or 'error' in response:
+        if response:
+            report_error(group_id, None, response['error'], f"⛔ Ошибка API [{response['error'].get('error_code')}]")
+        return None
+    items = response.get('response', {}).get('items', [])
+    return response['response'].get('count', 0), (items[0] if items else None)
+
+def find_post_offset(client, group_id, date, lo, hi, interrupt):
+    """Первое смещение в [lo, hi), где пост старше date. Стена идёт от новых постов к старым,
+    поэтому хватает log2(hi - lo) запросов по одному посту. None - запрос не удался"""
+    while lo < hi:
+        mid = (lo + hi) // 2
+        probe = probe_post(client, group_id, mid, interrupt)
+        if probe is None:
+            return None
+        post = probe[1]
+        if post is None or post['date'] < date:  # Конец стены (посты удаляются параллельно) или старше
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+def find_post_slice(client, group_id, dates, interrupt):
+    """Смещения [start, end) постов из диапазона дат и закреплённый пост, если он в диапазоне.
+
+    Закреплённый пост стоит первым вне порядка дат, поэтому поиск идёт со второго поста.
+    Возвращает (start, end, [закреплённый пост] или []) или None, если стену прочитать не удалось.
+    """
+    probe = probe_post(client, group_id, 0, interrupt)
+    if probe is None:
+        return None
+    total, first = probe
+    head = []
+    lo = 0
+    if first is not None and first.get('is_pinned'):
+        lo = 1
+        if post_in_dates(first, dates):
+            head = [first]
+
+    after, before = dates
+    start = lo if before is None else find_post_offset(client, group_id, before, lo, total, interrupt)
+    if start is None:
+        return None
+    end = total if after is None else find_post_offset(client, group_id, after, start, total, interrupt)
+    if end is None:
+        return None
+    return start, end, head
+
+def fetch_posts_slice(client, group_id, dates, count, interrupt):
+    """fetch_page(offset) для prefetch_pages, читающий только посты из диапазона дат.
+    None - границы диапазона найти не удалось.
+
+    Участок читается с конца (от старых постов к новым): удаление уже прочитанных постов
+    сдвигает только более дальние смещения, поэтому непрочитанные посты не пропускаются.
+    Закреплённый пост отдаётся последним по той же причине.
+    """
+    post_slice = find_post_slice(client, group_id, dates, interrupt)
+    if post_slice is None:
+        return None
+    start, end, head = post_slice
+    events.message(f"📅 Постов в диапазоне дат: {end - start + len(head)}")
+
+    def fetch(offset):
+        hi = end - offset
+        if hi <= start:
+            return head if offset == end - start else []
+        lo = max(start, hi - count)
+        return fetch_posts_page(client, group_id, lo, hi - lo, interrupt)
+
+    return fetch
+
+def get_posts_page_size():
+    return max(1, min(POSTS_PAGE_LIMIT, config.config.get("POSTS_PER_REQUEST", POSTS_PAGE_LIMIT)))
+
+def get_members_page_size():
+    return max(1, min(MEMBERS_PAGE_LIMIT, config.config.get("MEMBERS_PER_REQUEST", MEMBERS_PAGE_LIMIT)))
+
+def get_member_fields():
+    # last_seen нужен только для отбора неактивных, без него ответ заметно короче.
+    # deactivated VK возвращает всегда
+    return 'role,last_seen' if config.config.get("INACTIVE_DAYS", 0) > 0 else 'role'
+
+def get_inactive_before():
+    days = config.config.get("INACTIVE_DAYS", 0)
+    return time.time() - days * 86400 if days > 0 else None
+
+def select_members(members, inactive_before):
+    """ID обычных подписчиков страницы в порядке исключения: удалённые и заблокированные,
+    неактивные, остальные. С ONLY_INACTIVE остальные не исключаются"""
+    only_inactive = config.config.get("ONLY_INACTIVE", False)
+    ranked = sorted((member_priority(member, inactive_before), member['id'])
+                    for member in members if member.get('role', 'member') == 'member')
+    return [user_id for priority, user_id in ranked if not (only_inactive and priority == ACTIVE)]
+
+def fetch_members_page(client, group_id, offset, count, interrupt):
+    """Загружает страницу участников. Пустой список - участников больше нет, None - страница не получена
+    (повторы после сетевых и временных ошибок уже выполнил client.request)"""
+    if interrupt.interrupted:
+        return None
+
+    response = client.request('groups.getMembers', {
+        'group_id': abs(group_id),
+        'count': count,
+        'offset': offset,
+        'fields': get_member_fields()
+    }, interrupt)
+
+    if not response:
+        return None
+
+    if 'error' in response:  # Нет прав на список участников или неверная группа - повтор не поможет
+        error = response['error']
+        report_error(group_id, None, error, f"⛔ Ошибка API [{error.get('error_code')}]")
+        return None
+
+    return response.get('response', {}).get('items', [])
+
+def read_listing(fetch_page, interrupt):
+    """Страницы списка с предзагрузкой и смещения, страницы которых получить не удалось.
+    Непустой второй список после обхода - список неполный, снимок по нему составлять нельзя"""
+    gave_up = []
+
+    def fetch(offset):
+        items = fetch_page(offset)
+        if items is None:
+            gave_up.append(offset)
+        return items
+
+    return prefetch_pages(fetch, interrupt, config.config.get("PREFETCH_PAGES", 2)), gave_up
+
+def snapshot_items(journal, group_id, kind, fetch_page, extract_ids, interrupt):
+    """Заносит в журнал полный список ID до начала удаления. False - снимок не завершён"""
+    if journal.has_snapshot(group_id, kind):
+        events.message(f"📒 Продолжаем по журналу, осталось: {journal.count(group_id, kind)}")
+        return True
+
+    events.message("📒 Составляем список для удаления...")
+    journal.start_snapshot(group_id, kind)
+    pages, gave_up = read_listing(fetch_page, interrupt)
+    for page in pages:
+        journal.add_items(group_id, kind, extract_ids(page))
+
+    # Незавершённый снимок будет составлен заново при следующем запуске
+    if interrupt.interrupted or gave_up:
+        return False
+    journal.finish_snapshot(group_id, kind)
+    events.message(f"📒 В списке: {journal.count(group_id, kind)}")
+    return True
+
+def snapshot_posts(client, journal, group_id, interrupt):
+    count = get_posts_page_size()
+    dates = get_post_dates()
+    if dates is None or journal.has_snapshot(group_id, 'post'):
+        # Стена целиком: до BULK_PAGES страниц одним execute
+        return snapshot_items(journal, group_id, 'post',
+                              fetch_pages_bulk(client, group_id, 'wall.get', {'owner_id': group_id}, count, interrupt),
+                              lambda items: [post['id'] for post in items], interrupt)
+
+    # Диапазон дат: границы находятся двоичным поиском, читается только нужный участок стены
+    fetch = fetch_posts_slice(client, group_id, dates, count, interrupt)
+    if fetch is None:
+        return False
+    return snapshot_items(journal, group_id, 'post', fetch,
+                          lambda items: [post['id'] for post in items if post_in_dates(post, dates)], interrupt)
+
+def snapshot_members(client, journal, group_id, interrupt):
+    """Составляет список подписчиков в журнале. Пока идёт обход, ID копятся в компактных массивах
+    (4 байта на участника) по очередям исключения; руководители, своя страница и список
+    неудаляемых вычитаются одним проходом перед записью в журнал"""
+    if journal.has_snapshot(group_id, 'member'):
+        events.message(f"📒 Продолжаем по журналу, осталось: {journal.count(group_id, 'member')}")
+        return True
+
+    inactive_before = get_inactive_before()
+    queues = {priority: MemberCollector() for priority in (DEAD, INACTIVE, ACTIVE)}
+    managers = MemberCollector()
+    # До BULK_PAGES страниц по 1000 участников одним execute
+    fetch_page = fetch_pages_bulk(client, group_id, 'groups.getMembers',
+                                  {'group_id': abs(group_id), 'fields': get_member_fields()},
+                                  get_members_page_size(), interrupt)
+
+    events.message("📒 Составляем список для удаления...")
+    pages, gave_up = read_listing(fetch_page, interrupt)
+    for page in pages:
+        for member in page:
+            if member.get('role', 'member') != 'member':
+                managers.append(member['id'])
+            else:
+                queues[member_priority(member, inactive_before)].append(member['id'])
+
+    # Незавершённый снимок будет составлен заново при следующем запуске
+    if interrupt.interrupted or gave_up:
+        return False
+
+    excluded = managers.build() | MemberSet([int(config.config.get("USER_ID", 0))])
+    skip_list = get_skip_list()
+    if skip_list:
+        excluded = excluded | MemberSet(skip_list.items(group_id, 'member'))
+    if config.config.get("ONLY_INACTIVE", False):
+        del queues[ACTIVE]
+
+    journal.start_snapshot(group_id, 'member')
+    counts = dict.fromkeys((DEAD, INACTIVE, ACTIVE), 0)
+    for priority, queue in queues.items():
+        user_ids = queue.build() - excluded
+        journal.add_items(group_id, 'member', user_ids, priority)
+        counts[priority] = len(user_ids)
+    journal.finish_snapshot(group_id, 'member')
+    events.message(f"📒 В списке: {sum(counts.values())} (удалённых и заблокированных страниц: {counts[DEAD]}, "
+                   f"неактивных: {counts[INACTIVE]})")
+    return True
+
+def process_journal(client, journal, group_id, kind, batch_size, delete, interrupt, within_limit=lambda: True):
+    """Берёт из журнала пачки и удаляет их delete(item_ids, failed), отдавая ID удалённых после каждой пачки.
+    Итог пачки сразу записывается в журнал. Останавливается по лимиту (within_limit), прерыванию,
+    отозванному токену или если пачка не продвинулась"""
+    while not interrupt.interrupted and not client.dead and within_limit():
+        item_ids = journal.claim(group_id, kind, batch_size)
+        if not item_ids:
             break
-            
-        items = response['response']['items']
-        if not items:
-            print("\nБольше нет постов для удаления")
+
+        failed = []
+        done = delete(item_ids, failed)
+        journal.mark(group_id, kind, done, DONE)
+        journal.mark(group_id, kind, failed, FAILED)
+        # Необработанное (лимит, прерывание, отозванный токен) возвращаем другим токенам
+        journal.mark(group_id, kind, set(item_ids) - set(done) - set(failed), PENDING)
+        yield done
+
+        if not done and not failed:  # Сеть или флуд-контроль - продолжим в следующий запуск
             break
-            
-        for post in items:
-            if interrupt.interrupted or limits['posts_deleted'] >= config.config["MAX_POSTS_PER_HOUR"]:
-                break
-                
-            if safe_delete_post(int(config.config["GROUP_ID"]), post['id'], limits, interrupt):
-                deleted += 1
-                print(f"Удален пост {post['id']} ({deleted} в этой сессии)")
-        
-        offset += count
-        attempts = 0
-        
+
+def delete_posts_from_journal(client, journal, group_id, limits, interrupt):
+    deleted = 0
+    if config.config.get("USE_EXECUTE", True):
+        def delete(post_ids, failed):
+            return safe_delete_posts_batch(client, group_id, post_ids, limits, interrupt, failed)
+    else:
+        def delete(post_ids, failed):
+            return [post_id for post_id in post_ids
+                    if safe_delete_post(client, group_id, post_id, limits, interrupt, failed)]
+
+    for done in process_journal(client, journal, group_id, 'post', get_batch_size(), delete, interrupt,
+                                lambda: limits['posts_deleted'] < config.config["MAX_POSTS_PER_HOUR"]):
+        for post_id in done:
+            deleted += 1
+            events.emit(events.POST_DELETED, group_id=group_id, post_id=post_id, session_total=deleted)
+
+    if limits['posts_deleted'] >= config.config["MAX_POSTS_PER_HOUR"]:
+        reset_time = datetime.fromtimestamp(limits['last_post_reset'] + 3600)
+        events.emit(events.LIMIT_REACHED, group_id=group_id, limit='posts', reset_time=reset_time)
+    elif not interrupt.interrupted and not client.dead and not journal.remaining(group_id, 'post'):
+        events.message("\nПосты закончились")
+        journal.drain(group_id, 'post')  # Следующий запуск проверит стену заново
+
     return deleted
 
-def remove_users(limits, interrupt):
-    offset = 0
-    count = min(100, config.config.get("MEMBERS_PER_REQUEST", 100))
+def remove_users_from_journal(client, journal, group_id, limits, interrupt):
+    removed = 0
+    reset_time = get_next_day_reset(limits['last_user_reset'])
+    if config.config.get("USE_EXECUTE", True):
+        def delete(user_ids, failed):
+            return safe_remove_users_batch(client, group_id, user_ids, limits, interrupt, failed)
+    else:
+        def delete(user_ids, failed):
+            return [user_id for user_id in user_ids
+                    if safe_remove_user(client, group_id, user_id, limits, interrupt, failed)]
+
+    for done in process_journal(client, journal, group_id, 'member', get_batch_size(), delete, interrupt,
+                                lambda: limits['users_deleted'] < config.config["MAX_USERS_PER_DAY"]):
+        for user_id in done:
+            removed += 1
+            events.emit(events.MEMBER_REMOVED, group_id=group_id, user_id=user_id, session_total=removed,
+                        daily_limit=config.config['MAX_USERS_PER_DAY'])
+
+    if limits['users_deleted'] >= config.config["MAX_USERS_PER_DAY"]:
+        events.emit(events.LIMIT_REACHED, group_id=group_id, limit='members', reset_time=reset_time)
+    elif interrupt.interrupted:
+        events.message("🛑 Обнаружено прерывание!")
+    elif not client.dead and not journal.remaining(group_id, 'member'):
+        events.message("\nПодписчики закончились")
+        if removed > 0:
+            events.message("\n🎉 Поздравляю! Все подписчики удалены!")
+            events.message("Для завершения удалите руководителей группы вручную через:")
+            events.message("Управление сообществом → Участники → Исключить")
+        journal.drain(group_id, 'member')  # Следующий запуск проверит список участников заново
+
+    return removed
+
+def delete_posts(client, group_id, limits, interrupt, journal=None):
+    if journal is not None:
+        if not snapshot_posts(client, journal, group_id, interrupt):
+            return 0
+        return delete_posts_from_journal(client, journal, group_id, limits, interrupt)
+
+    count = get_posts_page_size()
+    deleted = 0
+    dates = get_post_dates()
+    if dates is None:
+        fetch = lambda offset: fetch_posts_page(client, group_id, offset, count, interrupt)
+    else:
+        fetch = fetch_posts_slice(client, group_id, dates, count, interrupt)
+        if fetch is None:
+            return 0
+
+    # Следующие страницы загружаются в фоне, пока удаляются посты текущей
+    pages = prefetch_pages(fetch, interrupt, config.config.get("PREFETCH_PAGES", 2))
+
+    for items in pages:
+        if limits['posts_deleted'] >= config.config["MAX_POSTS_PER_HOUR"]:
+            break
+        if dates is not None:  # Стена могла сдвинуться, пока шло удаление
+            items = [post for post in items if post_in_dates(post, dates)]
+
+        if config.config.get("USE_EXECUTE", True):
+            batch_size = get_batch_size()
+            post_ids = [post['id'] for post in items]
+            for i in range(0, len(post_ids), batch_size):
+                if interrupt.interrupted or limits['posts_deleted'] >= config.config["MAX_POSTS_PER_HOUR"]:
+                    break
+
+                for post_id in safe_delete_posts_batch(client, group_id, post_ids[i:i + batch_size], limits, interrupt):
+                    deleted += 1
+                    events.emit(events.POST_DELETED, group_id=group_id, post_id=post_id, session_total=deleted)
+        else:
+            for post in items:
+                if interrupt.interrupted or limits['posts_deleted'] >= config.config["MAX_POSTS_PER_HOUR"]:
+                    break
+
+                if safe_delete_post(client, group_id, post['id'], limits, interrupt):
+                    deleted += 1
+                    events.emit(events.POST_DELETED, group_id=group_id, post_id=post['id'], session_total=deleted)
+    pages.close()
+
+    if limits['posts_deleted'] >= config.config["MAX_POSTS_PER_HOUR"]:
+        reset_time = datetime.fromtimestamp(limits['last_post_reset'] + 3600)
+        events.emit(events.LIMIT_REACHED, group_id=group_id, limit='posts', reset_time=reset_time)
+
+    return deleted
+
+def remove_users(client, group_id, limits, interrupt, journal=None):
+    count = get_members_page_size()
     removed = 0
-    retry_count = 0
-    max_retries = config.config.get("API_RETRY_LIMIT", 3)
     has_regular_members = False
+    members_left = False
 
     #Вычисляем reset_time один раз в начале функции
     reset_time = get_next_day_reset(limits['last_user_reset'])
+    inactive_before = get_inactive_before()
     
     if limits['users_deleted'] >= config.config["MAX_USERS_PER_DAY"]:
-        print(f"⏳ Лимит удалений подписчиков достигнут! Вернитесь после {reset_time.strftime('%d.%m.%Y %H:%M')}")
+        events.emit(events.LIMIT_REACHED, group_id=group_id, limit='members', reset_time=reset_time)
         return 0
-    
-    while not interrupt.interrupted and retry_count < max_retries:
-        if interrupt.interrupted:
-            print("🛑 Обнаружено прерывание!")
-            break
-            
-        response = vk_api_request('groups.getMembers', {
-            'group_id': abs(int(config.config["GROUP_ID"])),
-            'count': count,
-            'offset': offset,
-            'fields': 'role'
-        }, interrupt)
-        
-        if not response:
-            retry_count += 1
-            time.sleep(5)
-            continue
-            
-        if 'error' in response:
-            error = response['error']
-            error_code = error.get('error_code')
-            
-            if error_code in [15, 7, 100]:  # Админы/создатели/руководители 
-                continue
-            elif error_code == 9:  # Флуд-контроль
-                delay = config.config.get("FLOOD_DELAY", 10)
-                print(f"⏳ Флуд-контроль. Ждем {delay} сек...")
-                time.sleep(delay)
-                continue
-            else:
-                print(f"⛔ Ошибка API [{error_code}]: {error.get('error_msg', 'Неизвестная ошибка')}")
-            
-            retry_count += 1
-            continue
-            
-        members = response.get('response', {}).get('items', [])
-        if not members:
-            if removed > 0 and not has_regular_members:
-                print("\nПодписчики закончились")
-                print("\n🎉 Поздравляю! Все подписчики удалены!")
-                print("Для завершения удалите руководителей группы вручную через:")
-                print("Управление сообществом → Участники → Исключить")
+
+    if journal is not None:
+        if not snapshot_members(client, journal, group_id, interrupt):
+            return 0
+        return remove_users_from_journal(client, journal, group_id, limits, interrupt)
+
+    # Следующие страницы загружаются в фоне, пока исключаются подписчики текущей
+    pages = prefetch_pages(
+        lambda offset: fetch_members_page(client, group_id, offset, count, interrupt),
+        interrupt, config.config.get("PREFETCH_PAGES", 2))
+
+    for members in pages:
+        if limits['users_deleted'] >= config.config["MAX_USERS_PER_DAY"]:
+            members_left = True
             break
-            
-        for member in members:
-            if interrupt.interrupted:
-                break
-                
-            user_id = member['id']
-            role = member.get('role', 'member')
-            
-            if role != 'member':  # Пропускаем всех руководителей
-                continue
-                
-            # Обычные подписчики
+
+        # Руководители пропускаются, обычные подписчики - начиная с неактивных
+        user_ids = select_members(members, inactive_before)
+        if any(member.get('role', 'member') == 'member' for member in members):
             has_regular_members = True
-            if safe_remove_user(int(config.config["GROUP_ID"]), user_id, limits, interrupt):
-                removed += 1
-                print(f"❌ Удалён подписчик {user_id} ({removed}/{config.config['MAX_USERS_PER_DAY']})")
-                
+
+        if config.config.get("USE_EXECUTE", True):
+            # Удаляем пачками
+            batch_size = get_batch_size()
+            for i in range(0, len(user_ids), batch_size):
+                if interrupt.interrupted:
+                    break
+
+                for user_id in safe_remove_users_batch(client, group_id, user_ids[i:i + batch_size], limits, interrupt):
+                    removed += 1
+                    events.emit(events.MEMBER_REMOVED, group_id=group_id, user_id=user_id, session_total=removed,
+                                daily_limit=config.config['MAX_USERS_PER_DAY'])
+
                 if limits['users_deleted'] >= config.config["MAX_USERS_PER_DAY"]:
-                    print(f"⚠️ Достигнут дневной лимит удалений! Вернитесь после {reset_time.strftime('%d.%m.%Y %H:%M')}")
+                    events.emit(events.LIMIT_REACHED, group_id=group_id, limit='members', reset_time=reset_time)
+                    break
+        else:
+            for user_id in user_ids:
+                if interrupt.interrupted:
                     break
-                    
-        offset += len(members)
-        retry_count = 0
+
+                if safe_remove_user(client, group_id, user_id, limits, interrupt):
+                    removed += 1
+                    events.emit(events.MEMBER_REMOVED, group_id=group_id, user_id=user_id, session_total=removed,
+                                daily_limit=config.config['MAX_USERS_PER_DAY'])
+
+                    if limits['users_deleted'] >= config.config["MAX_USERS_PER_DAY"]:
+                        events.emit(events.LIMIT_REACHED, group_id=group_id, limit='members', reset_time=reset_time)
+                        break
+    pages.close()
+
+    if interrupt.interrupted:
+        events.message("🛑 Обнаружено прерывание!")
+    elif not members_left and removed > 0 and not has_regular_members:
+        events.message("\nПодписчики закончились")
+        events.message("\n🎉 Поздравляю! Все подписчики удалены!")
+        events.message("Для завершения удалите руководителей группы вручную через:")
+        events.message("Управление сообществом → Участники → Исключить")
 
     return removed
 
-def main(interrupt):
-    if getattr(sys, 'frozen', False):
-        import shutil
-        temp_dir = os.path.join(os.environ.get('TEMP', ''), 'vk_cleaner_cache')
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+def run_sharded(worker, clients, limits):
+    """Запускает worker(client, limits) для каждого токена параллельно и суммирует результат"""
+    if len(clients) == 1:
+        return worker(clients[0], limits[clients[0].token])
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        return sum(pool.map(lambda client: worker(client, limits[client.token]), clients))
+
+def print_limits(clients, limits):
+    for client in clients:
+        label = f" [токен {client.name}]" if len(clients) > 1 else ""
+        events.message(f"📝 Постов{label}: {limits[client.token]['posts_deleted']}/{config.config['MAX_POSTS_PER_HOUR']}")
+        events.message(f"👥 Подписчиков{label}: {limits[client.token]['users_deleted']}/{config.config['MAX_USERS_PER_DAY']}")
+
+def clean_group(clients, group_id, interrupt, journal=None, kinds=None):
+    """Очищает одну группу: сначала посты, затем подписчики, медиафайлы - параллельно с ними.
+
+    У каждой группы и каждого токена свои лимиты. Работа из журнала делится между токенами,
+    без журнала используется первый действующий токен. kinds - только эти этапы ('post', 'member').
+    """
+    clients = [client for client in clients if not client.dead]
+    if not clients:
+        events.message(f"\n❌ Для группы {group_id} не осталось действующих токенов")
+        return
+    if journal is None:
+        clients = clients[:1]
 
+    limits = {client.token: load_limits(group_id, client.fingerprint) for client in clients}
+    media = None
     try:
-        limits = manage_limits('read')
-        
-        print("\n=== VK UnSub & PostDelete ===")
-        print(f"Лимиты:")
-        print(f"📝 Постов: {limits['posts_deleted']}/{config.config['MAX_POSTS_PER_HOUR']} (час)")
-        print(f"👥 Подписчиков: {limits['users_deleted']}/{config.config['MAX_USERS_PER_DAY']} (день)")
-        
+        events.message(f"\n=== Группа {group_id} ===")
+        events.message(f"Лимиты:")
+        print_limits(clients, limits)
+
+        # Медиафайлы удаляются параллельно с постами и подписчиками, у них свои ограничения скорости
+        if config.config.get("CLEAN_MEDIA", False) and not interrupt.interrupted:
+            from media_cleaner import clean_media
+            media = threading.Thread(target=clean_media, args=(clients[0], group_id, interrupt, journal), daemon=True)
+            media.start()
+
         # Обработка постов
-        if not interrupt.interrupted:
-            print("\n[1] Удаление постов...")
-            deleted_posts = delete_posts(limits, interrupt)
-            print(f"\nУдалено постов: {deleted_posts}")
-        
-        # Обработка подписчиков
-        if not interrupt.interrupted and limits['users_deleted'] < config.config["MAX_USERS_PER_DAY"]:
-            print("\n[2] Удаление подписчиков...")
-            removed_users = remove_users(limits, interrupt)
-            print(f"\nУдалено подписчиков: {removed_users}")
-            
+        if not interrupt.interrupted and (kinds is None or 'post' in kinds):
+            events.message(f"\n[1] Удаление постов группы {group_id}...")
+            if journal is None:
+                deleted_posts = delete_posts(clients[0], group_id, limits[clients[0].token], interrupt)
+            elif snapshot_posts(clients[0], journal, group_id, interrupt):
+                deleted_posts = run_sharded(
+                    lambda client, client_limits: delete_posts_from_journal(client, journal, group_id, client_limits, interrupt),
+                    clients, limits)
+            else:
+                deleted_posts = 0
+            events.message(f"\nУдалено постов в группе {group_id}: {deleted_posts}")
+
+        # Обработка подписчиков: только токенами, у которых остался дневной лимит
+        member_clients = [client for client in clients
+                          if not client.dead and limits[client.token]['users_deleted'] < config.config["MAX_USERS_PER_DAY"]]
+        if not interrupt.interrupted and member_clients and (kinds is None or 'member' in kinds):
+            events.message(f"\n[2] Удаление подписчиков группы {group_id}...")
+            if journal is None:
+                removed_users = remove_users(member_clients[0], group_id, limits[member_clients[0].token], interrupt)
+            elif snapshot_members(member_clients[0], journal, group_id, interrupt):
+                removed_users = run_sharded(
+                    lambda client, client_limits: remove_users_from_journal(client, journal, group_id, client_limits, interrupt),
+                    member_clients, limits)
+            else:
+                removed_users = 0
+            events.message(f"\nУдалено подписчиков в группе {group_id}: {removed_users}")
+
+    except Exception as e:
+        events.emit(events.ERROR, code=None, group_id=group_id, text=f"\n🔥 Критическая ошибка в группе {group_id}: {e}")
+    finally:
+        if media is not None:
+            media.join()
+        # Счётчики уже в базе - каждое удаление записывалось сразу
+        events.message(f"\n📊 Итоговые лимиты группы {group_id}:")
+        print_limits(clients, {token: group_limits.refresh() for token, group_limits in limits.items()})
+
+def make_scheduler(journal, group_ids=None):
+    return Scheduler(group_ids or config.get_group_ids(config.config), journal,
+                     lambda group_id, client: load_limits(group_id, client.fingerprint))
+
+def main(interrupt, clients=None, stages=None):
+    """stages - {group_id: {этапы}} от планировщика; None - все группы и этапы из настроек"""
+    # По клиенту на каждый токен: свои соединения, ограничитель скорости и счётчики
+    own_clients = clients is None
+    if own_clients:
+        clients = [VKClient.from_config(config.config, token) for token in config.get_tokens(config.config)]
+    # Журнал работ: сначала полный список ID, затем удаление по нему
+    journal = WorkJournal(JOURNAL_FILE) if config.config.get("SNAPSHOT_MODE", True) else None
+    group_ids = list(stages) if stages else config.get_group_ids(config.config)
+    stages = stages or {}
+    pool = None
+
+    # Правки скорости в config.json или в интерфейсе применяются без перезапуска
+    def apply_pacing(settings, changed):
+        for client in clients:
+            client.limiter.update_from_config(settings, changed)
+        retry.breaker.update_from_config(settings, changed)
+    retry.breaker.update_from_config(config.config)
+    config.config.subscribe(apply_pacing)
+    config.config.watch()
+    # Метрики: удаления и паузы приходят событиями, задержки и ошибки API пишет клиент
+    events.subscribe(metrics.on_event)
+    metrics.start_export(config.config.get("METRICS_FILE"), config.config.get("METRICS_PORT"))
+    # Итоги - только этого запуска: служба и интерфейс запускают очистку много раз в одном процессе
+    run_start = metrics.checkpoint()
+
+    try:
+        events.message("\n=== VK UnSub & PostDelete ===")
+        if len(clients) > 1:
+            events.message(f"Токенов: {len(clients)}")
+        if len(group_ids) == 1:
+            clean_group(clients, group_ids[0], interrupt, journal, stages.get(group_ids[0]))
+        else:
+            # Группы чистятся параллельно, общие клиенты делят между ними лимит запросов токенов
+            workers = max(1, min(len(group_ids), config.config.get("GROUP_WORKERS", 4)))
+            events.message(f"Групп в работе: {len(group_ids)}, одновременно: {workers}")
+            pool = ThreadPoolExecutor(max_workers=workers)
+            futures = [pool.submit(clean_group, clients, group_id, interrupt, journal, stages.get(group_id))
+                       for group_id in group_ids]
+            for future in futures:
+                future.result()
+
     except KeyboardInterrupt:
-        print("\n🛑 Получен сигнал прерывания!")
+        events.message("\n🛑 Получен сигнал прерывания!")
         interrupt.handler()
     except Exception as e:
-        print(f"\n🔥 Критическая ошибка: {e}")
+        events.emit(events.ERROR, code=None, text=f"\n🔥 Критическая ошибка: {e}")
     finally:
-        if 'limits' in locals():
-            manage_limits('write', limits)
-            print("\n📊 Итоговые лимиты:")
-            print(f"📝 Постов: {limits['posts_deleted']}/{config.config['MAX_POSTS_PER_HOUR']}")
-            print(f"👥 Подписчиков: {limits['users_deleted']}/{config.config['MAX_USERS_PER_DAY']}")
-        print("\n📊 Статистика сохранена!")
\ No newline at end of file
+        if pool is not None:
+            pool.shutdown(wait=True)
+        config.config.unsubscribe(apply_pacing)
+        events.unsubscribe(metrics.on_event)
+        events.message("\n📈 Итоги:")
+        for line in metrics.summary(run_start):
+            events.message(line)
+        if config.config.get("METRICS_FILE"):
+            try:
+                metrics.write(config.config["METRICS_FILE"])
+            except OSError as e:
+                events.emit(events.ERROR, code=None, text=f"⚠️ Не удалось записать метрики: {e}")
+        events.message("\n📊 Статистика сохранена!")
+        if journal is not None:
+            # Прогноз по оставшейся работе; в режиме службы его выводит сама служба
+            if not stages and not interrupt.interrupted:
+                scheduler = make_scheduler(journal)
+                scheduler.report(scheduler.plan(clients))
+            journal.close()
+        if interrupt.interrupted:
+            events.message("🛑 Остановлено. Журнал и счётчики лимитов сохранены - следующий запуск продолжит с этого места")
+        if own_clients:
+            for client in clients:
+                client.close()
+
+def sleep_until(moment, interrupt):
+    start = time.time()
+    # Короткими отрезками: часы могут перевести, пока процесс ждёт
+    while time.time() < moment and not interrupt.wait(min(60, moment - time.time())):
+        pass
+    metrics.inc('vk_sleep_seconds_total', time.time() - start, reason='reset_wait')
+
+def run_daemon(interrupt, clients):
+    """Повторяет очистку после каждого сброса лимита, пока работа не закончится.
+
+    Запуском управляет планировщик: в работу идут только этапы с открытым окном лимита,
+    а служба спит до ближайшего открытия окна у этапа, которому есть что удалять.
+    """
+    journal = WorkJournal(JOURNAL_FILE)
+    scheduler = make_scheduler(journal)
+    try:
+        while not interrupt.interrupted and not all(client.dead for client in clients):
+            plans = scheduler.plan(clients)
+            scheduler.report(plans)
+            stages = scheduler.runnable(plans)
+            if stages:
+                main(interrupt, clients, stages)
+                scheduler.update(stages, plans, scheduler.plan(clients))
+                continue
+            moment = scheduler.wake_time(plans)
+            if moment is None:
+                events.message("\n✅ Очистка завершена")
+                break
+            # Секунда запаса, чтобы проверка лимита уже видела сброс
+            events.message(f"\n💤 Ждём открытия окна лимита до {datetime.fromtimestamp(moment).strftime('%d.%m.%Y %H:%M:%S')}")
+            sleep_until(moment + 1, interrupt)
+    finally:
+        journal.close()
+
+def cli(argv=None):
+    """Запуск без графического интерфейса: python -m vk_cleaner"""
+    import argparse
+    import signal
+
+    parser = argparse.ArgumentParser(prog="python -m vk_cleaner",
+                                     description="Удаление постов и подписчиков групп VK без графического интерфейса")
+    parser.add_argument('-g', '--group', action='append', default=[],
+                        help="ID группы, можно несколько раз или через запятую (переменная VK_GROUP_IDS)")
+    parser.add_argument('-t', '--token', action='append', default=[],
+                        help="Токен администратора, можно несколько раз (переменная VK_ACCESS_TOKENS - безопаснее)")
+    parser.add_argument('-d', '--daemon', action='store_true',
+                        help="Не завершаться: ждать сброса часового и суточного лимита и продолжать")
+    parser.add_argument('--plan', action='store_true',
+                        help="Показать оставшуюся работу и прогноз завершения по журналу и выйти")
+    parser.add_argument('--media', action='store_true', help="Удалять альбомы, фото, видео и документы")
+    parser.add_argument('--before', help="Удалять только посты, опубликованные до даты (ГГГГ-ММ-ДД)")
+    parser.add_argument('--after', help="Удалять только посты, опубликованные в эту дату или позже (ГГГГ-ММ-ДД)")
+    parser.add_argument('--log', help="Дописывать события с отметкой времени в файл")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Не выводить сообщения в консоль")
+    parser.add_argument('--metrics-file', help="Файл метрик в формате Prometheus (обновляется каждые 10 сек)")
+    parser.add_argument('--metrics-port', type=int, help="Отдавать метрики по http://127.0.0.1:порт/metrics")
+    args = parser.parse_args(argv)
+
+    groups = args.group or [os.environ.get('VK_GROUP_IDS', '')]
+    tokens = args.token or [os.environ.get('VK_ACCESS_TOKENS', '')]
+    overrides = {}
+    group_ids = [g.strip() for value in groups for g in value.split(',') if g.strip()]
+    if group_ids:
+        overrides.update({"GROUP_ID": group_ids[0], "GROUP_IDS": group_ids})
+    tokens = [t.strip() for value in tokens for t in value.split(',') if t.strip()]
+    if tokens:
+        overrides.update({"ACCESS_TOKEN": tokens[0], "ACCESS_TOKENS": tokens[1:]})
+    if args.media:
+        overrides["CLEAN_MEDIA"] = True
+    if args.before:
+        overrides["POSTS_BEFORE"] = args.before
+    if args.after:
+        overrides["POSTS_AFTER"] = args.after
+    if args.metrics_file:
+        overrides["METRICS_FILE"] = args.metrics_file
+    if args.metrics_port:
+        overrides["METRICS_PORT"] = args.metrics_port
+    if args.daemon:
+        # Без журнала нельзя отличить законченную очистку от сбоя сети или пропущенных при обходе записей
+        overrides["SNAPSHOT_MODE"] = True
+    # Аргументы действуют только на этот запуск и не записываются в config.json
+    config.config.override(overrides)
+
+    if not config.get_group_ids(config.config):
+        parser.error("не указан ID группы (--group или VK_GROUP_IDS)")
+    if not config.get_tokens(config.config):
+        parser.error("не указан токен (--token или VK_ACCESS_TOKENS)")
+    try:
+        get_post_dates()
+    except ValueError as e:
+        parser.error(str(e))
+
+    interrupt = GracefulInterrupt()
+    # Ctrl+C и остановка службы прерывают паузы и запросы, журнал и счётчики сохраняются.
+    # Event.set() из обработчика сигнала может зависнуть на блокировке, которую держит
+    # прерванный основной поток, поэтому остановка выполняется в отдельном потоке
+    def stop(*_):
+        threading.Thread(target=interrupt.handler, daemon=True).start()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    if not args.quiet:
+        events.subscribe(events.print_event)
+    file_log = events.FileLog(args.log) if args.log else None
+    if file_log is not None:
+        events.subscribe(file_log)
+
+    clients = [VKClient.from_config(config.config, token) for token in config.get_tokens(config.config)]
+    try:
+        if args.plan:
+            # Только локальные журнал и счётчики лимитов, без запросов к VK
+            journal = WorkJournal(JOURNAL_FILE)
+            scheduler = make_scheduler(journal)
+            scheduler.report(scheduler.plan(clients))
+            journal.close()
+        elif args.daemon:
+            run_daemon(interrupt, clients)
+        else:
+            main(interrupt, clients)
+    finally:
+        for client in clients:
+            client.close()
+        if file_log is not None:
+            events.unsubscribe(file_log)
+            file_log.close()
+    return 1 if all(client.dead for client in clients) else 0
+
+if __name__ == "__main__":
+    # Модуль импортируется под своим именем, чтобы media_cleaner и остальные работали с теми же объектами
+    import vk_cleaner
+    sys.exit(vk_cleaner.cli())
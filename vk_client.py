@@ -0,0 +1,180 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import events
+from metrics import metrics
+import retry
+from rate_limiter import RateLimiter, THROTTLE_ERRORS
+
+# Переменная окружения VK_API_URL позволяет направить клиент на локальный сервер (bench/fake_vk_server.py)
+VK_API_URL = os.environ.get('VK_API_URL', 'https://api.vk.com/method/')
+
+# Удаляющие методы: ответ на них при остановке дожидаемся, иначе удаление не попадёт в счётчики лимитов и журнал
+MUTATING_METHODS = ('wall.delete', 'groups.removeUser', 'photos.delete', 'photos.deleteAlbum', 'video.delete', 'docs.delete')
+
+def wrapped_methods(params):
+    """Методы VK, которые вызывает код execute"""
+    return sorted(set(re.findall(r"API\.([\w.]+)\(", (params or {}).get('code', ''))))
+
+def is_mutating(method, params):
+    if method == 'execute':
+        return any(name in MUTATING_METHODS for name in wrapped_methods(params))
+    return method in MUTATING_METHODS
+
+def metric_method(method, params):
+    # Почти все запросы идут через execute, поэтому в метриках он подписан методами, которые выполняет
+    if method == 'execute':
+        return f"execute:{'+'.join(wrapped_methods(params))}"
+    return method
+
+class Cancelled(Exception):
+    """Запрос брошен из-за остановки, ответ VK не дождались"""
+
+class VKClient:
+    """Клиент VK API с пулом keep-alive соединений и собственным ограничителем скорости"""
+
+    def __init__(self, token, version, api_url=VK_API_URL, timeout=30, pool_size=10, limiter=None):
+        self.token = token
+        self.version = version
+        self.api_url = api_url
+        self.timeout = timeout
+        self.limiter = limiter or RateLimiter()
+        self.dead = False  # Токен отозван или недействителен - клиент больше не используется
+
+        # requests загружается при создании первого клиента: запуск из командной строки с --help
+        # или с ошибкой в аргументах не тратит на него время
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        # Одна сессия на клиента: TLS-соединения переиспользуются между запросами
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @classmethod
+    def from_config(cls, config, token=None):
+        return cls(token or config["ACCESS_TOKEN"], config["VERSION"], limiter=RateLimiter.from_config(config))
+
+    @property
+    def name(self):
+        return f"…{self.token[-4:]}"
+
+    @property
+    def fingerprint(self):
+        """Короткий отпечаток токена для имён файлов - сам токен на диск не пишем"""
+        return hashlib.sha1(self.token.encode()).hexdigest()[:8]
+
+    def close(self):
+        self.session.close()
+
+    def call(self, method, params=None, interrupt=None):
+        """Один запрос к API без обработки ошибок VK. Сетевые ошибки пробрасываются наверх.
+
+        С interrupt чтение идёт в отдельном потоке, а вызывающий ждёт ответа или остановки:
+        при остановке поток с запросом бросается (он завершится по таймауту) и вылетает Cancelled.
+        Удаления не бросаются: их ответ ждём не дольше таймаута, чтобы учесть сделанное
+        """
+        if interrupt is None or is_mutating(method, params):
+            return self._post(method, params)
+
+        done = threading.Event()
+        outcome = {}
+
+        def run():
+            try:
+                outcome['result'] = self._post(method, params)
+            except Exception as e:
+                outcome['error'] = e
+            finally:
+                done.set()
+
+        threading.Thread(target=run, daemon=True).start()
+        interrupt.wait_for(done)
+        if not outcome:  # Разбудила остановка, ответа ещё нет
+            raise Cancelled(method)
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+
+    def _post(self, method, params):
+        data = dict(params or {})
+        data.update({
+            'access_token': self.token,
+            'v': self.version,
+            'timestamp': int(time.time()),
+            'random_id': int(time.time() * 1000)
+        })
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.api_url + method, data=data, timeout=self.timeout)
+            return response.json()
+        finally:
+            metrics.observe('vk_api_request_seconds', time.perf_counter() - start,
+                            method=metric_method(method, params))
+
+    def request(self, method, params, interrupt):
+        """Запрос с повторами по правилам RetryPolicy. Возвращает ответ VK (в том числе с постоянной
+        ошибкой, например 15 или 100) или None, если запрос прерван либо повторы исчерпаны"""
+        policy = self.limiter.policy
+        attempt = 0
+
+        while True:
+            # Все запросы ждут общий выключатель и проходят через ограничитель скорости
+            if not retry.breaker.wait(interrupt) or not self.limiter.acquire(method, interrupt):
+                events.message("🛑 Обнаружено прерывание во время ожидания")
+                return None
+
+            try:
+                result = self.call(method, params, interrupt)
+            except Cancelled:
+                events.message("🛑 Запрос к VK прерван остановкой")
+                return None
+            except Exception as e:
+                metrics.inc('vk_api_errors_total', method=metric_method(method, params), code=retry.NETWORK_ERROR)
+                retry.breaker.record(False)
+                if not policy.should_retry(retry.NETWORK_ERROR, attempt):
+                    events.emit(events.ERROR, code=None, method=method, text=f"⚠️ Ошибка соединения: {e}")
+                    return None
+                delay = policy.delay(retry.NETWORK_ERROR, attempt)
+                events.message(f"⚠️ Ошибка соединения: {e}. Повтор через {round(delay)} сек...")
+                if not retry.sleep(delay, interrupt):
+                    return None
+                attempt += 1
+                continue
+
+            error_code = result['error'].get('error_code') if 'error' in result else None
+            if error_code is None:
+                retry.breaker.record(True)
+                self.limiter.success(method)
+                return result
+
+            metrics.inc('vk_api_errors_total', method=metric_method(method, params), code=error_code)
+
+            # Обработка невалидного токена
+            if error_code in retry.FATAL_ERRORS:  # Incorrect signature / User authorization failed
+                self.dead = True
+                events.emit(events.ERROR, code=error_code, method=method,
+                            text=f"\n❌ Ошибка: Токен {self.name} не активен. Получите новый токен по инструкции в приложении")
+                return None
+
+            if not retry.is_transient(error_code):  # Постоянная ошибка - решает вызывающий код
+                retry.breaker.record(True)
+                return result
+
+            retry.breaker.record(False)
+            if not policy.should_retry(error_code, attempt):
+                events.emit(events.ERROR, code=error_code, method=method,
+                            text=f"⚠️ {method}: повторы исчерпаны ({result['error'].get('error_msg', 'Неизвестная ошибка')})")
+                return None
+
+            if error_code in THROTTLE_ERRORS:
+                # Флуд-контроль и Rate Limit: ограничитель сам выдержит паузу перед повтором
+                delay = self.limiter.backoff(method, error_code, attempt)
+                events.emit(events.RATE_LIMITED, method=method, code=error_code, delay=delay,
+                            message=result['error'].get('error_msg'))
+            elif not retry.sleep(policy.delay(error_code, attempt), interrupt):  # Внутренняя ошибка VK
+                return None
+            attempt += 1
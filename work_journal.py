@@ -0,0 +1,115 @@
+import sqlite3
+import threading
+import time
+
+PENDING, DONE, FAILED, CLAIMED = 0, 1, 2, 3
+# snapshots.completed: список составляется, составлен, работа по нему закончена
+LISTING, LISTED, DRAINED = 0, 1, 2
+
+class WorkJournal:
+    """Журнал работ на SQLite: снимок ID постов/участников и отметки о выполнении.
+
+    Прерванный или упёршийся в лимит запуск продолжает с того места, где остановился,
+    без повторного обхода стены и списка участников.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    group_id INTEGER, kind TEXT, completed INTEGER, created REAL,
+                    PRIMARY KEY (group_id, kind))""")
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    group_id INTEGER, kind TEXT, item_id INTEGER, status INTEGER DEFAULT 0,
+                    priority INTEGER DEFAULT 0,
+                    PRIMARY KEY (group_id, kind, item_id)) WITHOUT ROWID""")
+            # Журналы прежних версий - без приоритета
+            columns = [row[1] for row in self.db.execute("PRAGMA table_info(items)")]
+            if 'priority' not in columns:
+                self.db.execute("ALTER TABLE items ADD COLUMN priority INTEGER DEFAULT 0")
+            # Без индекса по статусу выборка ожидающих просматривает все уже удалённые элементы,
+            # приоритет в индексе отдаёт элементы в нужном порядке без сортировки
+            self.db.execute("DROP INDEX IF EXISTS items_status")
+            self.db.execute("CREATE INDEX IF NOT EXISTS items_claim ON items (group_id, kind, status, priority)")
+            # Элементы, взятые в работу упавшим процессом, снова становятся доступными
+            self.db.execute("UPDATE items SET status = ? WHERE status = ?", (PENDING, CLAIMED))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def has_snapshot(self, group_id, kind):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT completed FROM snapshots WHERE group_id = ? AND kind = ?",
+                (group_id, kind)).fetchone()
+        return bool(row and row[0] == LISTED)
+
+    def is_drained(self, group_id, kind):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT completed FROM snapshots WHERE group_id = ? AND kind = ?",
+                (group_id, kind)).fetchone()
+        return bool(row and row[0] == DRAINED)
+
+    def start_snapshot(self, group_id, kind):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM items WHERE group_id = ? AND kind = ?", (group_id, kind))
+            self.db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                            (group_id, kind, LISTING, time.time()))
+
+    def add_items(self, group_id, kind, item_ids, priority=0):
+        """Элементы с меньшим priority выдаются claim() раньше"""
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR IGNORE INTO items (group_id, kind, item_id, priority) VALUES (?, ?, ?, ?)",
+                                ((group_id, kind, item_id, priority) for item_id in item_ids))
+
+    def finish_snapshot(self, group_id, kind):
+        with self.lock, self.db:
+            self.db.execute("UPDATE snapshots SET completed = ? WHERE group_id = ? AND kind = ?",
+                            (LISTED, group_id, kind))
+
+    def clear(self, group_id, kind):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM items WHERE group_id = ? AND kind = ?", (group_id, kind))
+            self.db.execute("DELETE FROM snapshots WHERE group_id = ? AND kind = ?", (group_id, kind))
+
+    def drain(self, group_id, kind):
+        """Работа по списку закончена: элементы удаляются, отметка остаётся, чтобы планировщик
+        отличал сделанную работу от ещё не составленного списка. Следующий запуск составит список заново"""
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM items WHERE group_id = ? AND kind = ?", (group_id, kind))
+            self.db.execute("UPDATE snapshots SET completed = ? WHERE group_id = ? AND kind = ?",
+                            (DRAINED, group_id, kind))
+
+    def claim(self, group_id, kind, limit):
+        """Атомарно забирает до limit ожидающих элементов, чтобы токены не делили одну работу"""
+        with self.lock, self.db:
+            rows = self.db.execute(
+                "SELECT item_id FROM items WHERE group_id = ? AND kind = ? AND status = ? ORDER BY priority LIMIT ?",
+                (group_id, kind, PENDING, limit)).fetchall()
+            item_ids = [row[0] for row in rows]
+            self.db.executemany("UPDATE items SET status = ? WHERE group_id = ? AND kind = ? AND item_id = ?",
+                                ((CLAIMED, group_id, kind, item_id) for item_id in item_ids))
+        return item_ids
+
+    def remaining(self, group_id, kind):
+        """Ожидающие и взятые в работу элементы"""
+        with self.lock:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM items WHERE group_id = ? AND kind = ? AND status IN (?, ?)",
+                (group_id, kind, PENDING, CLAIMED)).fetchone()[0]
+
+    def count(self, group_id, kind, status=PENDING):
+        with self.lock:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM items WHERE group_id = ? AND kind = ? AND status = ?",
+                (group_id, kind, status)).fetchone()[0]
+
+    def mark(self, group_id, kind, item_ids, status):
+        with self.lock, self.db:
+            self.db.executemany("UPDATE items SET status = ? WHERE group_id = ? AND kind = ? AND item_id = ?",
+                                ((status, group_id, kind, item_id) for item_id in item_ids))